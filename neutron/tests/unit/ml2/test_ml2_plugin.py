@@ -13,23 +13,25 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import contextlib
+import itertools
 import mock
-import testtools
-import uuid
-import webob
 
 from neutron.common import exceptions as exc
 from neutron import context
+from neutron.db import api as db
 from neutron.extensions import multiprovidernet as mpnet
 from neutron.extensions import portbindings
 from neutron.extensions import providernet as pnet
 from neutron import manager
+from neutron.openstack.common import jsonutils
 from neutron.plugins.common import constants as service_constants
 from neutron.plugins.ml2.common import exceptions as ml2_exc
 from neutron.plugins.ml2 import config
 from neutron.plugins.ml2 import driver_api
+from neutron.plugins.ml2 import managers
+from neutron.plugins.ml2 import models
 from neutron.plugins.ml2 import plugin as ml2_plugin
+from neutron.tests import base
 from neutron.tests.unit import _test_extension_portbindings as test_bindings
 from neutron.tests.unit.ml2.drivers import mechanism_logger as mech_logger
 from neutron.tests.unit.ml2.drivers import mechanism_test as mech_test
@@ -46,49 +48,94 @@ config.cfg.CONF.import_opt('network_vlan_ranges',
 
 PLUGIN_NAME = 'neutron.plugins.ml2.plugin.Ml2Plugin'
 
+_TENANT_SEQ = itertools.count()
 
-class Ml2PluginV2TestCase(test_plugin.NeutronDbPluginV2TestCase):
+
+def _tenant_id():
+    return "tenant-%08x" % next(_TENANT_SEQ)
+
+
+def _profile_of_length(length):
+    # Build a binding:profile whose serialized form is length bytes long.
+    return {'d': 'x' * (length - len(jsonutils.dumps({'d': ''})))}
+
+
+_OVERSIZE_PROFILE = {'d': 'x' * 5000}
+
+# Messages logged by Ml2Plugin.delete_port; no translation is installed
+# while testing, so the plain literals are what reaches the logger.
+_MSG_DELETING_PORT = "Deleting port %s"
+_MSG_PORT_DELETED = "The port '%s' was deleted"
+
+
+class Ml2RequestHelpersMixin(object):
+
+    def _post_expect_status(self, collection, data, expected):
+        req = self.new_create_request(collection, data)
+        res = req.get_response(self.api)
+        self.assertEqual(expected, res.status_int)
+        return res
+
+    def _check_error(self, res, expected, err_type):
+        self.assertEqual(expected, res.status_int)
+        error = self.deserialize(self.fmt, res)
+        self.assertEqual(err_type, error['NeutronError']['type'])
+
+    def _post_expect_error(self, collection, data, expected, err_type):
+        req = self.new_create_request(collection, data)
+        self._check_error(req.get_response(self.api), expected, err_type)
+
+
+class Ml2PluginV2TestCase(Ml2RequestHelpersMixin,
+                          test_plugin.NeutronDbPluginV2TestCase):
 
     _plugin_name = PLUGIN_NAME
     _mechanism_drivers = ['logger', 'test']
-
-    def setUp(self):
-        # We need a L3 service plugin
-        l3_plugin = ('neutron.tests.unit.test_l3_plugin.'
-                     'TestL3NatServicePlugin')
-        service_plugins = {'l3_plugin_name': l3_plugin}
+    # We need a L3 service plugin
+    _service_plugins = {'l3_plugin_name': 'neutron.tests.unit.test_l3_plugin.'
+                                          'TestL3NatServicePlugin'}
+    physnet = 'physnet1'
+    vlan_range = '1:100'
+    phys_vrange = ':'.join([physnet, vlan_range])
+
+    def _apply_ml2_overrides(self):
+        # The overrides are undone by the CONF.reset cleanup of every test,
+        # so they cannot be applied once per class.
         # Enable the test mechanism driver to ensure that
         # we can successfully call through to all mechanism
         # driver apis.
         config.cfg.CONF.set_override('mechanism_drivers',
                                      self._mechanism_drivers,
                                      group='ml2')
-        self.physnet = 'physnet1'
-        self.vlan_range = '1:100'
-        self.phys_vrange = ':'.join([self.physnet, self.vlan_range])
         config.cfg.CONF.set_override('network_vlan_ranges', [self.phys_vrange],
                                      group='ml2_type_vlan')
-        super(Ml2PluginV2TestCase, self).setUp(PLUGIN_NAME,
-                                               service_plugins=service_plugins)
+
+    def setUp(self):
+        self._apply_ml2_overrides()
+        super(Ml2PluginV2TestCase, self).setUp(
+            PLUGIN_NAME, service_plugins=self._service_plugins)
         self.port_create_status = 'DOWN'
-        self.driver = ml2_plugin.Ml2Plugin()
+        # Reuse the plugin loaded by the NeutronManager rather than
+        # building a second Ml2Plugin with its own driver managers.
+        self.driver = manager.NeutronManager.get_plugin()
         self.context = context.get_admin_context()
 
 
-class TestMl2BulkToggleWithBulkless(Ml2PluginV2TestCase):
+class TestMl2BulkToggle(Ml2PluginV2TestCase):
 
-    _mechanism_drivers = ['logger', 'test', 'bulkless']
+    # Native bulk support is only disabled when a loaded mechanism driver
+    # does not support it.
+    _expected_skip_native_bulk = False
 
-    def test_bulk_disable_with_bulkless_driver(self):
-        self.assertTrue(self._skip_native_bulk)
+    def test_native_bulk_toggle(self):
+        self.assertEqual(self._expected_skip_native_bulk,
+                         self._skip_native_bulk)
 
 
-class TestMl2BulkToggleWithoutBulkless(Ml2PluginV2TestCase):
+class TestMl2BulkToggleWithBulkless(TestMl2BulkToggle):
 
-    _mechanism_drivers = ['logger', 'test']
-
-    def test_bulk_enabled_with_bulk_drivers(self):
-        self.assertFalse(self._skip_native_bulk)
+    _mechanism_drivers = ['logger', 'test', 'bulkless']
+    _expected_skip_native_bulk = True
 
 
 class TestMl2BasicGet(test_plugin.TestBasicGet,
@@ -119,49 +166,42 @@ class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
             self.assertEqual('DOWN', self.port_create_status)
 
     def test_update_non_existent_port(self):
-        ctx = context.get_admin_context()
-        plugin = manager.NeutronManager.get_plugin()
         data = {'port': {'admin_state_up': False}}
-        self.assertRaises(exc.PortNotFound, plugin.update_port, ctx,
-                          'invalid-uuid', data)
+        self.assertRaises(exc.PortNotFound, self.driver.update_port,
+                          self.context, 'invalid-uuid', data)
 
     def test_delete_non_existent_port(self):
-        ctx = context.get_admin_context()
-        plugin = manager.NeutronManager.get_plugin()
         with mock.patch.object(ml2_plugin.LOG, 'debug') as log_debug:
-            plugin.delete_port(ctx, 'invalid-uuid', l3_port_check=False)
+            self.driver.delete_port(self.context, 'invalid-uuid',
+                                    l3_port_check=False)
             log_debug.assert_has_calls([
-                mock.call(_("Deleting port %s"), 'invalid-uuid'),
-                mock.call(_("The port '%s' was deleted"), 'invalid-uuid')
+                mock.call(_MSG_DELETING_PORT, 'invalid-uuid'),
+                mock.call(_MSG_PORT_DELETED, 'invalid-uuid')
             ])
 
     def test_delete_port_no_notify_in_disassociate_floatingips(self):
-        ctx = context.get_admin_context()
-        plugin = manager.NeutronManager.get_plugin()
         l3plugin = manager.NeutronManager.get_service_plugins().get(
             service_constants.L3_ROUTER_NAT)
-        with contextlib.nested(
-            self.port(no_delete=True),
-            mock.patch.object(l3plugin, 'disassociate_floatingips'),
-            mock.patch.object(l3plugin, 'notify_routers_updated')
-        ) as (port, disassociate_floatingips, notify):
+        disassociate_floatingips = mock.patch.object(
+            l3plugin, 'disassociate_floatingips').start()
+        notify = mock.patch.object(l3plugin, 'notify_routers_updated').start()
+        with self.port(no_delete=True) as port:
 
             port_id = port['port']['id']
-            plugin.delete_port(ctx, port_id)
+            self.driver.delete_port(self.context, port_id)
 
             # check that no notification was requested while under
             # transaction
             disassociate_floatingips.assert_has_calls([
-                mock.call(ctx, port_id, do_notify=False)
+                mock.call(self.context, port_id, do_notify=False)
             ])
 
             # check that notifier was still triggered
             notify.assert_has_calls([
-                mock.call(ctx, disassociate_floatingips.return_value)
+                mock.call(self.context, disassociate_floatingips.return_value)
             ])
 
     def test_disassociate_floatingips_do_notify_returns_nothing(self):
-        ctx = context.get_admin_context()
         l3plugin = manager.NeutronManager.get_service_plugins().get(
             service_constants.L3_ROUTER_NAT)
         with self.port() as port:
@@ -169,7 +209,8 @@ class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
             port_id = port['port']['id']
             # check that nothing is returned when notifications are handled
             # by the called method
-            self.assertIsNone(l3plugin.disassociate_floatingips(ctx, port_id))
+            self.assertIsNone(
+                l3plugin.disassociate_floatingips(self.context, port_id))
 
 
 class TestMl2PortBinding(Ml2PluginV2TestCase,
@@ -200,16 +241,25 @@ class TestMl2PortBinding(Ml2PluginV2TestCase,
     def test_update_port_binding_profile(self):
         self._test_update_port_binding_profile({'c': 3})
 
+    def _test_create_port_binding_profile_size(self, profile, status):
+        # The database is cleared on tearDown, so neither the network nor
+        # an accepted port has to be deleted through the API.
+        network = self._make_network(self.fmt, 'net1', True)
+        profile_arg = {portbindings.PROFILE: profile}
+        self._create_port(self.fmt, network['network']['id'],
+                          expected_res_status=status,
+                          arg_list=(portbindings.PROFILE,), **profile_arg)
+
+    def test_create_port_binding_profile_max_size(self):
+        self._test_create_port_binding_profile_size(
+            _profile_of_length(models.BINDING_PROFILE_LEN), 201)
+
+    def test_create_port_binding_profile_one_too_big(self):
+        self._test_create_port_binding_profile_size(
+            _profile_of_length(models.BINDING_PROFILE_LEN + 1), 400)
+
     def test_create_port_binding_profile_too_big(self):
-        s = 'x' * 5000
-        profile_arg = {portbindings.PROFILE: {'d': s}}
-        try:
-            with self.port(expected_res_status=400,
-                           arg_list=(portbindings.PROFILE,),
-                           **profile_arg):
-                pass
-        except webob.exc.HTTPClientError:
-            pass
+        self._test_create_port_binding_profile_size(_OVERSIZE_PROFILE, 400)
 
     def test_remove_port_binding_profile(self):
         profile = {'e': 5}
@@ -247,6 +297,14 @@ class TestMultiSegmentNetworks(Ml2PluginV2TestCase):
     def setUp(self, plugin=None):
         super(TestMultiSegmentNetworks, self).setUp()
 
+    def _assert_segments(self, expected, actual):
+        fields = (pnet.NETWORK_TYPE, pnet.PHYSICAL_NETWORK,
+                  pnet.SEGMENTATION_ID)
+        self.assertEqual([dict((f, seg.get(f)) for f in fields)
+                          for seg in expected],
+                         [dict((f, seg.get(f)) for f in fields)
+                          for seg in actual])
+
     def test_create_network_provider(self):
         data = {'network': {'name': 'net1',
                             pnet.NETWORK_TYPE: 'vlan',
@@ -296,20 +354,14 @@ class TestMultiSegmentNetworks(Ml2PluginV2TestCase):
         network_req = self.new_create_request('networks', data)
         network = self.deserialize(self.fmt,
                                    network_req.get_response(self.api))
-        tz = network['network'][mpnet.SEGMENTS]
-        for tz in data['network'][mpnet.SEGMENTS]:
-            for field in [pnet.NETWORK_TYPE, pnet.PHYSICAL_NETWORK,
-                          pnet.SEGMENTATION_ID]:
-                self.assertEqual(tz.get(field), tz.get(field))
+        self._assert_segments(data['network'][mpnet.SEGMENTS],
+                              network['network'][mpnet.SEGMENTS])
 
         # Tests get_network()
         net_req = self.new_show_request('networks', network['network']['id'])
         network = self.deserialize(self.fmt, net_req.get_response(self.api))
-        tz = network['network'][mpnet.SEGMENTS]
-        for tz in data['network'][mpnet.SEGMENTS]:
-            for field in [pnet.NETWORK_TYPE, pnet.PHYSICAL_NETWORK,
-                          pnet.SEGMENTATION_ID]:
-                self.assertEqual(tz.get(field), tz.get(field))
+        self._assert_segments(data['network'][mpnet.SEGMENTS],
+                              network['network'][mpnet.SEGMENTS])
 
     def test_create_network_with_provider_and_multiprovider_fail(self):
         data = {'network': {'name': 'net1',
@@ -322,9 +374,7 @@ class TestMultiSegmentNetworks(Ml2PluginV2TestCase):
                             pnet.SEGMENTATION_ID: 1,
                             'tenant_id': 'tenant_one'}}
 
-        network_req = self.new_create_request('networks', data)
-        res = network_req.get_response(self.api)
-        self.assertEqual(400, res.status_int)
+        self._post_expect_status('networks', data, 400)
 
     def test_create_network_duplicate_segments(self):
         data = {'network': {'name': 'net1',
@@ -336,27 +386,7 @@ class TestMultiSegmentNetworks(Ml2PluginV2TestCase):
                               pnet.PHYSICAL_NETWORK: 'physnet1',
                               pnet.SEGMENTATION_ID: 1}],
                             'tenant_id': 'tenant_one'}}
-        network_req = self.new_create_request('networks', data)
-        res = network_req.get_response(self.api)
-        self.assertEqual(400, res.status_int)
-
-    def test_release_segment_no_type_driver(self):
-        segment = {driver_api.NETWORK_TYPE: 'faketype',
-                   driver_api.PHYSICAL_NETWORK: 'physnet1',
-                   driver_api.ID: 1}
-        with mock.patch('neutron.plugins.ml2.managers.LOG') as log:
-            self.driver.type_manager.release_segment(session=None,
-                                                     segment=segment)
-        log.error.assert_called_once_with(
-            "Failed to release segment '%s' because "
-            "network type is not supported.", segment)
-
-    def test_create_provider_fail(self):
-        segment = {pnet.NETWORK_TYPE: None,
-                   pnet.PHYSICAL_NETWORK: 'phys_net',
-                   pnet.SEGMENTATION_ID: None}
-        with testtools.ExpectedException(exc.InvalidInput):
-            self.driver._process_provider_create(segment)
+        self._post_expect_status('networks', data, 400)
 
     def test_create_network_plugin(self):
         data = {'network': {'name': 'net1',
@@ -373,8 +403,30 @@ class TestMultiSegmentNetworks(Ml2PluginV2TestCase):
 
         with mock.patch('neutron.plugins.ml2.managers.MechanismManager.'
                         'create_network_precommit', new=raise_mechanism_exc):
-            with testtools.ExpectedException(ml2_exc.MechanismDriverError):
-                self.driver.create_network(self.context, data)
+            self.assertRaises(ml2_exc.MechanismDriverError,
+                              self.driver.create_network, self.context, data)
+
+
+class TestMl2PluginHelpers(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestMl2PluginHelpers, self).setUp()
+        # These tests call plugin methods directly, so the plugin is built
+        # without the API router and extensions of Ml2PluginV2TestCase.
+        config.cfg.CONF.set_override('notify_nova_on_port_status_changes',
+                                     False)
+        config.cfg.CONF.set_override('mechanism_drivers', ['logger', 'test'],
+                                     group='ml2')
+        self.driver = ml2_plugin.Ml2Plugin()
+        self.context = context.get_admin_context()
+        self.addCleanup(db.clear_db)
+
+    def test_create_provider_fail(self):
+        segment = {pnet.NETWORK_TYPE: None,
+                   pnet.PHYSICAL_NETWORK: 'phys_net',
+                   pnet.SEGMENTATION_ID: None}
+        self.assertRaises(exc.InvalidInput,
+                          self.driver._process_provider_create, segment)
 
     def test_extend_dictionary_no_segments(self):
         network = dict(name='net_no_segment', id='5', tenant_id='tenant_one')
@@ -384,6 +436,28 @@ class TestMultiSegmentNetworks(Ml2PluginV2TestCase):
         self.assertIsNone(network[pnet.SEGMENTATION_ID])
 
 
+class TestTypeManagerReleaseSegment(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestTypeManagerReleaseSegment, self).setUp()
+        # Releasing a segment does not need the plugin, the API or the
+        # database, only a type manager with some driver loaded.
+        config.cfg.CONF.set_override('type_drivers', ['local'], group='ml2')
+        config.cfg.CONF.set_override('tenant_network_types', ['local'],
+                                     group='ml2')
+        self.type_manager = managers.TypeManager()
+
+    def test_release_segment_no_type_driver(self):
+        segment = {driver_api.NETWORK_TYPE: 'faketype',
+                   driver_api.PHYSICAL_NETWORK: 'physnet1',
+                   driver_api.ID: 1}
+        with mock.patch('neutron.plugins.ml2.managers.LOG') as log:
+            self.type_manager.release_segment(session=None, segment=segment)
+        log.error.assert_called_once_with(
+            "Failed to release segment '%s' because "
+            "network type is not supported.", segment)
+
+
 class TestMl2AllowedAddressPairs(Ml2PluginV2TestCase,
                                  test_pair.TestAllowedAddressPairs):
     def setUp(self, plugin=None):
@@ -398,7 +472,8 @@ class DHCPOptsTestCase(test_dhcpopts.TestExtraDhcpOpt):
             plugin=PLUGIN_NAME)
 
 
-class Ml2PluginV2FaultyDriverTestCase(test_plugin.NeutronDbPluginV2TestCase):
+class Ml2PluginV2FaultyDriverTestCase(
+        Ml2RequestHelpersMixin, test_plugin.NeutronDbPluginV2TestCase):
 
     def setUp(self):
         # Enable the test mechanism driver to ensure that
@@ -410,230 +485,122 @@ class Ml2PluginV2FaultyDriverTestCase(test_plugin.NeutronDbPluginV2TestCase):
         super(Ml2PluginV2FaultyDriverTestCase, self).setUp(PLUGIN_NAME)
         self.port_create_status = 'DOWN'
 
+    def _make_background_network(self):
+        # The database is cleared on tearDown, so the network does not have
+        # to be deleted through the API once the test is done with it.
+        return self._make_network(self.fmt, 'net1', True)
+
+    def _subnet_payload(self, network):
+        return {'subnet': {'network_id': network['network']['id'],
+                           'cidr': '10.0.20.0/24',
+                           'ip_version': '4',
+                           'name': 'subnet1',
+                           'tenant_id': network['network']['tenant_id'],
+                           'gateway_ip': '10.0.2.1'}}
+
+    def _port_payload(self, network):
+        return {'port': {'network_id': network['network']['id'],
+                         'tenant_id': network['network']['tenant_id'],
+                         'name': 'port1',
+                         'admin_state_up': 1,
+                         'fixed_ips': []}}
+
 
 class TestFaultyMechansimDriver(Ml2PluginV2FaultyDriverTestCase):
 
-    def test_create_network_faulty(self):
+    # Patchers are stopped by the mock.patch.stopall cleanup.
+    def _fail_postcommit(self, postcommit):
+        mock.patch.object(mech_test.TestMechanismDriver, postcommit,
+                          side_effect=ml2_exc.MechanismDriverError).start()
+
+    def _patch_logger_postcommit(self, postcommit):
+        return mock.patch.object(mech_logger.LoggerMechanismDriver,
+                                 postcommit).start()
+
+    def _test_create_resource_faulty(self, resource, data, query_params):
+        collection = resource + 's'
+        self._fail_postcommit('create_%s_postcommit' % resource)
+        self._post_expect_error(collection, data, 500, 'MechanismDriverError')
+        items = self._list(collection, query_params=query_params)
+        self.assertFalse(items[collection])
+
+    def _test_delete_resource_faulty(self, resource, data):
+        collection = resource + 's'
+        postcommit = 'delete_%s_postcommit' % resource
+        self._fail_postcommit(postcommit)
+        logger_postcommit = self._patch_logger_postcommit(postcommit)
+
+        res = self._post_expect_status(collection, data, 201)
+        resource_id = self.deserialize(self.fmt, res)[resource]['id']
+
+        req = self.new_delete_request(collection, resource_id)
+        res = req.get_response(self.api)
+        self.assertEqual(204, res.status_int)
+        # Test if other mechanism driver was called
+        self.assertTrue(logger_postcommit.called)
+        self._show(collection, resource_id, expected_code=404)
+
+    def _test_update_resource_faulty(self, resource, data):
+        collection = resource + 's'
+        postcommit = 'update_%s_postcommit' % resource
+        self._fail_postcommit(postcommit)
+        logger_postcommit = self._patch_logger_postcommit(postcommit)
+
+        res = self._post_expect_status(collection, data, 201)
+        resource_id = self.deserialize(self.fmt, res)[resource]['id']
+
+        new_name = 'a_brand_new_name'
+        data = {resource: {'name': new_name}}
+        req = self.new_update_request(collection, data, resource_id)
+        self._check_error(req.get_response(self.api), 500,
+                          'MechanismDriverError')
+        # Test if other mechanism driver was called
+        self.assertTrue(logger_postcommit.called)
+        updated = self._show(collection, resource_id)
+        self.assertEqual(new_name, updated[resource]['name'])
+
+        self._delete(collection, resource_id)
 
-        with mock.patch.object(mech_test.TestMechanismDriver,
-                               'create_network_postcommit',
-                               side_effect=ml2_exc.MechanismDriverError):
-            tenant_id = str(uuid.uuid4())
-            data = {'network': {'name': 'net1',
-                                'tenant_id': tenant_id}}
-            req = self.new_create_request('networks', data)
-            res = req.get_response(self.api)
-            self.assertEqual(500, res.status_int)
-            error = self.deserialize(self.fmt, res)
-            self.assertEqual('MechanismDriverError',
-                             error['NeutronError']['type'])
-            query_params = "tenant_id=%s" % tenant_id
-            nets = self._list('networks', query_params=query_params)
-            self.assertFalse(nets['networks'])
+    def test_create_network_faulty(self):
+        tenant_id = _tenant_id()
+        data = {'network': {'name': 'net1',
+                            'tenant_id': tenant_id}}
+        self._test_create_resource_faulty('network', data,
+                                          "tenant_id=%s" % tenant_id)
 
     def test_delete_network_faulty(self):
-
-        with mock.patch.object(mech_test.TestMechanismDriver,
-                               'delete_network_postcommit',
-                               side_effect=ml2_exc.MechanismDriverError):
-            with mock.patch.object(mech_logger.LoggerMechanismDriver,
-                                   'delete_network_postcommit') as dnp:
-
-                data = {'network': {'name': 'net1',
-                                    'tenant_id': 'tenant_one'}}
-                network_req = self.new_create_request('networks', data)
-                network_res = network_req.get_response(self.api)
-                self.assertEqual(201, network_res.status_int)
-                network = self.deserialize(self.fmt, network_res)
-                net_id = network['network']['id']
-                req = self.new_delete_request('networks', net_id)
-                res = req.get_response(self.api)
-                self.assertEqual(204, res.status_int)
-                # Test if other mechanism driver was called
-                self.assertTrue(dnp.called)
-                self._show('networks', net_id,
-                           expected_code=webob.exc.HTTPNotFound.code)
+        data = {'network': {'name': 'net1',
+                            'tenant_id': 'tenant_one'}}
+        self._test_delete_resource_faulty('network', data)
 
     def test_update_network_faulty(self):
-
-        with mock.patch.object(mech_test.TestMechanismDriver,
-                               'update_network_postcommit',
-                               side_effect=ml2_exc.MechanismDriverError):
-            with mock.patch.object(mech_logger.LoggerMechanismDriver,
-                                   'update_network_postcommit') as unp:
-
-                data = {'network': {'name': 'net1',
-                                    'tenant_id': 'tenant_one'}}
-                network_req = self.new_create_request('networks', data)
-                network_res = network_req.get_response(self.api)
-                self.assertEqual(201, network_res.status_int)
-                network = self.deserialize(self.fmt, network_res)
-                net_id = network['network']['id']
-
-                new_name = 'a_brand_new_name'
-                data = {'network': {'name': new_name}}
-                req = self.new_update_request('networks', data, net_id)
-                res = req.get_response(self.api)
-                self.assertEqual(500, res.status_int)
-                error = self.deserialize(self.fmt, res)
-                self.assertEqual('MechanismDriverError',
-                                 error['NeutronError']['type'])
-                # Test if other mechanism driver was called
-                self.assertTrue(unp.called)
-                net = self._show('networks', net_id)
-                self.assertEqual(new_name, net['network']['name'])
-
-                self._delete('networks', net_id)
+        data = {'network': {'name': 'net1',
+                            'tenant_id': 'tenant_one'}}
+        self._test_update_resource_faulty('network', data)
 
     def test_create_subnet_faulty(self):
-
-        with mock.patch.object(mech_test.TestMechanismDriver,
-                               'create_subnet_postcommit',
-                               side_effect=ml2_exc.MechanismDriverError):
-
-            with self.network() as network:
-                net_id = network['network']['id']
-                data = {'subnet': {'network_id': net_id,
-                                   'cidr': '10.0.20.0/24',
-                                   'ip_version': '4',
-                                   'name': 'subnet1',
-                                   'tenant_id':
-                                   network['network']['tenant_id'],
-                                   'gateway_ip': '10.0.2.1'}}
-                req = self.new_create_request('subnets', data)
-                res = req.get_response(self.api)
-                self.assertEqual(500, res.status_int)
-                error = self.deserialize(self.fmt, res)
-                self.assertEqual('MechanismDriverError',
-                                 error['NeutronError']['type'])
-                query_params = "network_id=%s" % net_id
-                subnets = self._list('subnets', query_params=query_params)
-                self.assertFalse(subnets['subnets'])
+        network = self._make_background_network()
+        self._test_create_resource_faulty(
+            'subnet', self._subnet_payload(network),
+            "network_id=%s" % network['network']['id'])
 
     def test_delete_subnet_faulty(self):
-
-        with mock.patch.object(mech_test.TestMechanismDriver,
-                               'delete_subnet_postcommit',
-                               side_effect=ml2_exc.MechanismDriverError):
-            with mock.patch.object(mech_logger.LoggerMechanismDriver,
-                                   'delete_subnet_postcommit') as dsp:
-
-                with self.network() as network:
-                    data = {'subnet': {'network_id':
-                                       network['network']['id'],
-                                       'cidr': '10.0.20.0/24',
-                                       'ip_version': '4',
-                                       'name': 'subnet1',
-                                       'tenant_id':
-                                       network['network']['tenant_id'],
-                                       'gateway_ip': '10.0.2.1'}}
-                    subnet_req = self.new_create_request('subnets', data)
-                    subnet_res = subnet_req.get_response(self.api)
-                    self.assertEqual(201, subnet_res.status_int)
-                    subnet = self.deserialize(self.fmt, subnet_res)
-                    subnet_id = subnet['subnet']['id']
-
-                    req = self.new_delete_request('subnets', subnet_id)
-                    res = req.get_response(self.api)
-                    self.assertEqual(204, res.status_int)
-                    # Test if other mechanism driver was called
-                    self.assertTrue(dsp.called)
-                    self._show('subnets', subnet_id,
-                               expected_code=webob.exc.HTTPNotFound.code)
+        network = self._make_background_network()
+        self._test_delete_resource_faulty('subnet',
+                                          self._subnet_payload(network))
 
     def test_update_subnet_faulty(self):
-
-        with mock.patch.object(mech_test.TestMechanismDriver,
-                               'update_subnet_postcommit',
-                               side_effect=ml2_exc.MechanismDriverError):
-            with mock.patch.object(mech_logger.LoggerMechanismDriver,
-                                   'update_subnet_postcommit') as usp:
-
-                with self.network() as network:
-                    data = {'subnet': {'network_id':
-                                       network['network']['id'],
-                                       'cidr': '10.0.20.0/24',
-                                       'ip_version': '4',
-                                       'name': 'subnet1',
-                                       'tenant_id':
-                                       network['network']['tenant_id'],
-                                       'gateway_ip': '10.0.2.1'}}
-                    subnet_req = self.new_create_request('subnets', data)
-                    subnet_res = subnet_req.get_response(self.api)
-                    self.assertEqual(201, subnet_res.status_int)
-                    subnet = self.deserialize(self.fmt, subnet_res)
-                    subnet_id = subnet['subnet']['id']
-                    new_name = 'a_brand_new_name'
-                    data = {'subnet': {'name': new_name}}
-                    req = self.new_update_request('subnets', data, subnet_id)
-                    res = req.get_response(self.api)
-                    self.assertEqual(500, res.status_int)
-                    error = self.deserialize(self.fmt, res)
-                    self.assertEqual('MechanismDriverError',
-                                     error['NeutronError']['type'])
-                    # Test if other mechanism driver was called
-                    self.assertTrue(usp.called)
-                    subnet = self._show('subnets', subnet_id)
-                    self.assertEqual(new_name, subnet['subnet']['name'])
-
-                    self._delete('subnets', subnet['subnet']['id'])
+        network = self._make_background_network()
+        self._test_update_resource_faulty('subnet',
+                                          self._subnet_payload(network))
 
     def test_create_port_faulty(self):
-
-        with mock.patch.object(mech_test.TestMechanismDriver,
-                               'create_port_postcommit',
-                               side_effect=ml2_exc.MechanismDriverError):
-
-            with self.network() as network:
-                net_id = network['network']['id']
-                data = {'port': {'network_id': net_id,
-                                 'tenant_id':
-                                 network['network']['tenant_id'],
-                                 'name': 'port1',
-                                 'admin_state_up': 1,
-                                 'fixed_ips': []}}
-                req = self.new_create_request('ports', data)
-                res = req.get_response(self.api)
-                self.assertEqual(500, res.status_int)
-                error = self.deserialize(self.fmt, res)
-                self.assertEqual('MechanismDriverError',
-                                 error['NeutronError']['type'])
-                query_params = "network_id=%s" % net_id
-                ports = self._list('ports', query_params=query_params)
-                self.assertFalse(ports['ports'])
+        network = self._make_background_network()
+        self._test_create_resource_faulty(
+            'port', self._port_payload(network),
+            "network_id=%s" % network['network']['id'])
 
     def test_update_port_faulty(self):
-
-        with mock.patch.object(mech_test.TestMechanismDriver,
-                               'update_port_postcommit',
-                               side_effect=ml2_exc.MechanismDriverError):
-            with mock.patch.object(mech_logger.LoggerMechanismDriver,
-                                   'update_port_postcommit') as upp:
-
-                with self.network() as network:
-                    data = {'port': {'network_id': network['network']['id'],
-                                     'tenant_id':
-                                     network['network']['tenant_id'],
-                                     'name': 'port1',
-                                     'admin_state_up': 1,
-                                     'fixed_ips': []}}
-                    port_req = self.new_create_request('ports', data)
-                    port_res = port_req.get_response(self.api)
-                    self.assertEqual(201, port_res.status_int)
-                    port = self.deserialize(self.fmt, port_res)
-                    port_id = port['port']['id']
-
-                    new_name = 'a_brand_new_name'
-                    data = {'port': {'name': new_name}}
-                    req = self.new_update_request('ports', data, port_id)
-                    res = req.get_response(self.api)
-                    self.assertEqual(500, res.status_int)
-                    error = self.deserialize(self.fmt, res)
-                    self.assertEqual('MechanismDriverError',
-                                     error['NeutronError']['type'])
-                    # Test if other mechanism driver was called
-                    self.assertTrue(upp.called)
-                    port = self._show('ports', port_id)
-                    self.assertEqual(new_name, port['port']['name'])
-
-                    self._delete('ports', port['port']['id'])
+        network = self._make_background_network()
+        self._test_update_resource_faulty('port',
+                                          self._port_payload(network))
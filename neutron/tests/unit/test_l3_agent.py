@@ -13,8 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import contextlib
 import copy
+import itertools
 
 import mock
 import netaddr
@@ -24,106 +24,186 @@ from testtools import matchers
 from neutron.agent.common import config as agent_config
 from neutron.agent import l3_agent
 from neutron.agent.linux import interface
+from neutron.agent.linux import iptables_manager
 from neutron.common import config as base_config
 from neutron.common import constants as l3_constants
 from neutron.common import exceptions as n_exc
 from neutron.openstack.common import processutils
-from neutron.openstack.common import uuidutils
 from neutron.tests import base
 
 
-_uuid = uuidutils.generate_uuid
-HOSTNAME = 'myhost'
-FAKE_ID = _uuid()
-FIP_PRI = 32768
-
-
-class TestBasicRouterOperations(base.BaseTestCase):
-
-    def setUp(self):
-        super(TestBasicRouterOperations, self).setUp()
-        self.conf = cfg.ConfigOpts()
-        self.conf.register_opts(base_config.core_opts)
-        self.conf.register_opts(l3_agent.L3NATAgent.OPTS)
-        agent_config.register_interface_driver_opts_helper(self.conf)
-        agent_config.register_use_namespaces_opts_helper(self.conf)
-        agent_config.register_root_helper(self.conf)
-        self.conf.register_opts(interface.OPTS)
-        self.conf.set_override('router_id', 'fake_id')
-        self.conf.set_override('interface_driver',
-                               'neutron.agent.linux.interface.NullDriver')
-        self.conf.root_helper = 'sudo'
-
-        self.device_exists_p = mock.patch(
-            'neutron.agent.linux.ip_lib.device_exists')
-        self.device_exists = self.device_exists_p.start()
-
-        self.utils_exec_p = mock.patch(
-            'neutron.agent.linux.utils.execute')
-        self.utils_exec = self.utils_exec_p.start()
-
-        self.external_process_p = mock.patch(
-            'neutron.agent.linux.external_process.ProcessManager')
-        self.external_process = self.external_process_p.start()
-
-        self.send_arp_p = mock.patch(
-            'neutron.agent.l3_agent.L3NATAgent._send_gratuitous_arp_packet')
-        self.send_arp = self.send_arp_p.start()
+_UUID_SEQ = itertools.count()
 
-        self.dvr_cls_p = mock.patch('neutron.agent.linux.interface.NullDriver')
-        driver_cls = self.dvr_cls_p.start()
-        self.mock_driver = mock.MagicMock()
-        self.mock_driver.DEV_NAME_LEN = (
-            interface.LinuxInterfaceDriver.DEV_NAME_LEN)
-        driver_cls.return_value = self.mock_driver
 
-        self.ip_cls_p = mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
-        ip_cls = self.ip_cls_p.start()
-        self.mock_ip = mock.MagicMock()
-        ip_cls.return_value = self.mock_ip
+def _uuid():
+    # The tests only need distinct ids. The counter comes first so that
+    # device names, which keep just a prefix of the id, stay distinct.
+    return '%08x-0000-4000-8000-000000000000' % next(_UUID_SEQ)
 
-        self.ip_rule_p = mock.patch('neutron.agent.linux.ip_lib.IpRule')
-        ip_rule = self.ip_rule_p.start()
-        self.mock_rule = mock.MagicMock()
-        ip_rule.return_value = self.mock_rule
 
-        self.ip_dev_p = mock.patch('neutron.agent.linux.ip_lib.IPDevice')
-        ip_dev = self.ip_dev_p.start()
-        self.mock_ip_dev = mock.MagicMock()
-        ip_dev.return_value = self.mock_ip_dev
-
-        self.l3pluginApi_cls_p = mock.patch(
-            'neutron.agent.l3_agent.L3PluginApi')
-        l3pluginApi_cls = self.l3pluginApi_cls_p.start()
-        self.plugin_api = mock.Mock()
-        l3pluginApi_cls.return_value = self.plugin_api
+HOSTNAME = 'myhost'
+FAKE_ID = _uuid()
+FIP_PRI = 32768
+FLOATINGIP_KEY = l3_constants.FLOATINGIP_KEY
+FLOATINGIP_STATUS_ACTIVE = l3_constants.FLOATINGIP_STATUS_ACTIVE
+FLOATINGIP_STATUS_DOWN = l3_constants.FLOATINGIP_STATUS_DOWN
+FLOATINGIP_STATUS_ERROR = l3_constants.FLOATINGIP_STATUS_ERROR
+INTERFACE_KEY = l3_constants.INTERFACE_KEY
+
+
+def _ip_route_call(action, destination, nexthop):
+    return mock.call(['ip', 'route', action, 'to', destination,
+                      'via', nexthop], check_exit_code=False)
+
+
+# Expected 'ip route' commands of the routing table tests.
+_ROUTE_REPLACE_135_207_0_0 = _ip_route_call('replace', '135.207.0.0/16',
+                                            '1.2.3.4')
+_ROUTE_DELETE_135_207_0_0 = _ip_route_call('delete', '135.207.0.0/16',
+                                           '1.2.3.4')
+_ROUTE_REPLACE_135_207_111_111 = _ip_route_call(
+    'replace', '135.207.111.111/32', '1.2.3.4')
+_ROUTE_DELETE_135_207_111_111 = _ip_route_call(
+    'delete', '135.207.111.111/32', '1.2.3.4')
+_ROUTE_REPLACE_110_100_30 = _ip_route_call('replace', '110.100.30.0/24',
+                                           '10.100.10.30')
+_ROUTE_REPLACE_110_100_31 = _ip_route_call('replace', '110.100.31.0/24',
+                                           '10.100.10.30')
+_ROUTE_DELETE_110_100_30 = _ip_route_call('delete', '110.100.30.0/24',
+                                          '10.100.10.30')
+_ROUTE_DELETE_110_100_31 = _ip_route_call('delete', '110.100.31.0/24',
+                                          '10.100.10.30')
+
+
+_IPV4_PORT = {'id': _uuid(),
+              'network_id': _uuid(),
+              'admin_state_up': True,
+              'fixed_ips': [{'ip_address': '35.4.1.4',
+                             'subnet_id': _uuid()}],
+              'mac_address': 'ca:fe:de:ad:be:ef',
+              'subnet': {'cidr': '35.4.1.0/24',
+                         'gateway_ip': '35.4.1.1'}}
+_IPV6_PORT = {'id': _uuid(),
+              'network_id': _uuid(),
+              'admin_state_up': True,
+              'fixed_ips': [{'ip_address': 'fd00::2',
+                             'subnet_id': _uuid()}],
+              'mac_address': 'ca:fe:de:ad:be:ef',
+              'subnet': {'cidr': 'fd00::/64',
+                         'gateway_ip': 'fd00::1'}}
+_AGENT_GW_PORT = {'fixed_ips': [{'ip_address': '20.0.0.30',
+                                 'subnet_id': _uuid()}],
+                  'subnet': {'gateway_ip': '20.0.0.1'},
+                  'id': _uuid(),
+                  'network_id': _uuid(),
+                  'mac_address': 'ca:fe:de:ad:be:ef',
+                  'ip_cidr': '20.0.0.30/24'}
+
+
+def _floating_ip(fixed_ip_address='192.168.0.1', **kwargs):
+    """Return a floating ip for 15.1.2.3 with ids of its own."""
+    fip = {'id': _uuid(),
+           'port_id': _uuid(),
+           'floating_ip_address': '15.1.2.3',
+           'fixed_ip_address': fixed_ip_address}
+    fip.update(kwargs)
+    return fip
+
+
+def _rules_missing_from(rules, other_rules):
+    """Return the iptables rules in rules that other_rules lacks."""
+    # IptablesRule defines __eq__ but not __hash__, so key the set on
+    # the attributes that __eq__ compares.
+    others = set((o.chain, o.rule, o.top, o.wrap) for o in other_rules)
+    return [r for r in rules
+            if (r.chain, r.rule, r.top, r.wrap) not in others]
+
+
+class FakeInterfaceDriver(object):
+    """Interface driver that hands the agent the current test's mock."""
+
+    driver = None
+
+    def __new__(cls, conf):
+        return cls.driver
+
+
+class FakeLoopingCall(object):
+    """Stands in for the agent's looping calls, which no test inspects."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def start(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+
+class FakeRouterInfo(object):
+    """Holds just the router info the floating ip and snat code reads."""
+
+    def __init__(self, floating_ips=None, distributed=False):
+        self.router_id = _uuid()
+        self.ns_name = l3_agent.NS_PREFIX + self.router_id
+        self.router = {'distributed': distributed,
+                       FLOATINGIP_KEY: floating_ips or []}
+        self.iptables_manager = mock.Mock(
+            spec=iptables_manager.IptablesManager,
+            ipv4={'nat': mock.Mock(
+                spec_set=iptables_manager.IptablesTable())})
+
+
+_ROUTER_TEMPLATES = {}
+
+
+def _router_template(ip_version, num_internal_ports):
+    """Return the id-less router layout used by _prepare_router_data."""
+    key = (ip_version, num_internal_ports)
+    if key not in _ROUTER_TEMPLATES:
+        if ip_version == 4:
+            ip_addr = '19.4.4.4'
+            cidr = '19.4.4.0/24'
+            gateway_ip = '19.4.4.1'
+        elif ip_version == 6:
+            ip_addr = 'fd00::4'
+            cidr = 'fd00::/64'
+            gateway_ip = 'fd00::1'
 
-        self.looping_call_p = mock.patch(
-            'neutron.openstack.common.loopingcall.FixedIntervalLoopingCall')
-        self.looping_call_p.start()
+        ex_gw_port = {'id': None,
+                      'network_id': None,
+                      'fixed_ips': [{'ip_address': ip_addr,
+                                     'subnet_id': None}],
+                      'subnet': {'cidr': cidr,
+                                 'gateway_ip': gateway_ip}}
+        int_ports = []
+        for i in range(num_internal_ports):
+            int_ports.append({'id': None,
+                              'network_id': None,
+                              'admin_state_up': True,
+                              'fixed_ips': [{'ip_address': '35.4.%s.4' % i,
+                                             'subnet_id': None}],
+                              'mac_address': 'ca:fe:de:ad:be:ef',
+                              'subnet': {'cidr': '35.4.%s.0/24' % i,
+                                         'gateway_ip': '35.4.%s.1' % i}})
 
-        self.subnet_id_list = []
+        _ROUTER_TEMPLATES[key] = {
+            'id': None,
+            'distributed': False,
+            INTERFACE_KEY: int_ports,
+            'routes': [],
+            'gw_port': ex_gw_port}
+    return _ROUTER_TEMPLATES[key]
 
-    def test__sync_routers_task_raise_exception(self):
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        self.plugin_api.get_routers.side_effect = Exception()
-        with mock.patch.object(agent, '_cleanup_namespaces') as f:
-            agent._sync_routers_task(agent.context)
-        self.assertFalse(f.called)
 
-    def test__sync_routers_task_call_clean_stale_namespaces(self):
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        self.plugin_api.get_routers.return_value = mock.ANY
-        with mock.patch.object(agent, '_cleanup_namespaces') as f:
-            with mock.patch.object(agent, '_process_routers') as g:
-                agent._sync_routers_task(agent.context)
-        self.assertTrue(f.called)
-        g.assert_called_with(mock.ANY, all_routers=True)
+class TestRouterInfo(base.BaseTestCase):
+    # RouterInfo needs neither the agent configuration nor the patched
+    # ip_lib and interface driver of TestBasicRouterOperations.
 
     def test_router_info_create(self):
         id = _uuid()
-        ri = l3_agent.RouterInfo(id, self.conf.root_helper,
-                                 self.conf.use_namespaces, {})
+        ri = l3_agent.RouterInfo(id, 'sudo', True, {})
 
         self.assertTrue(ri.ns_name.endswith(id))
 
@@ -140,14 +220,109 @@ class TestBasicRouterOperations(base.BaseTestCase):
             'enable_snat': True,
             'routes': [],
             'gw_port': ex_gw_port}
-        ri = l3_agent.RouterInfo(id, self.conf.root_helper,
-                                 self.conf.use_namespaces, router)
+        ri = l3_agent.RouterInfo(id, 'sudo', True, router)
         self.assertTrue(ri.ns_name.endswith(id))
         self.assertEqual(ri.router, router)
 
+
+class TestBasicRouterOperations(base.BaseTestCase):
+
+    _conf = None
+
+    @classmethod
+    def _get_conf(cls):
+        # Registering the options is the same for every test, so it is
+        # done once; the overrides are dropped by conf.reset after each test.
+        if cls._conf is None:
+            conf = cfg.ConfigOpts()
+            conf.register_opts(base_config.core_opts)
+            conf.register_opts(l3_agent.L3NATAgent.OPTS)
+            agent_config.register_interface_driver_opts_helper(conf)
+            agent_config.register_use_namespaces_opts_helper(conf)
+            agent_config.register_root_helper(conf)
+            conf.register_opts(interface.OPTS)
+            cls._conf = conf
+        return cls._conf
+
+    def setUp(self):
+        super(TestBasicRouterOperations, self).setUp()
+        self.conf = self._get_conf()
+        self.addCleanup(self.conf.reset)
+        self.conf.set_override('router_id', 'fake_id')
+        self.conf.set_override(
+            'interface_driver',
+            'neutron.tests.unit.test_l3_agent.FakeInterfaceDriver')
+        self.conf.root_helper = 'sudo'
+
+        # The patchers are stopped by the mock.patch.stopall cleanup
+        # registered in BaseTestCase, so their handles are not kept.
+        self.utils_exec = mock.patch(
+            'neutron.agent.linux.utils.execute').start()
+        self.external_process = mock.patch(
+            'neutron.agent.linux.external_process.ProcessManager').start()
+        self.send_arp = mock.patch.object(
+            l3_agent.L3NATAgent, '_send_gratuitous_arp_packet').start()
+        # This handle is kept: _test_external_gateway_action stops the
+        # patcher early because it exercises the real method.
+        self.external_gateway_added_p = mock.patch.object(
+            l3_agent.L3NATAgent, 'external_gateway_added')
+        self.external_gateway_added = self.external_gateway_added_p.start()
+
+        self.mock_driver = mock.Mock(
+            DEV_NAME_LEN=interface.LinuxInterfaceDriver.DEV_NAME_LEN)
+        mock.patch.object(FakeInterfaceDriver, 'driver',
+                          self.mock_driver).start()
+
+        self.mock_ip = mock.MagicMock()
+        self.mock_rule = mock.Mock()
+        self.mock_ip_dev = mock.MagicMock()
+        ip_lib_mocks = mock.patch.multiple(
+            'neutron.agent.linux.ip_lib',
+            device_exists=mock.DEFAULT,
+            IPWrapper=mock.Mock(return_value=self.mock_ip),
+            IpRule=mock.Mock(return_value=self.mock_rule),
+            IPDevice=mock.Mock(return_value=self.mock_ip_dev)).start()
+        self.device_exists = ip_lib_mocks['device_exists']
+
+        self.plugin_api = mock.Mock(spec=l3_agent.L3PluginApi)
+        mock.patch('neutron.agent.l3_agent.L3PluginApi',
+                   return_value=self.plugin_api).start()
+
+        mock.patch('neutron.openstack.common.loopingcall.'
+                   'FixedIntervalLoopingCall', new=FakeLoopingCall).start()
+
+        self.subnet_id_list = []
+
+    def _test__sync_routers_task(self, get_routers):
+        self.plugin_api.get_routers = get_routers
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        # The agent is local to the test, so nothing has to be restored.
+        f = agent._cleanup_namespaces = mock.Mock()
+        g = agent._process_routers = mock.Mock()
+        agent._sync_routers_task(agent.context)
+        return f, g
+
+    def test__sync_routers_task_raise_exception(self):
+        f, g = self._test__sync_routers_task(
+            mock.Mock(side_effect=Exception()))
+        self.assertFalse(f.called)
+        self.assertFalse(g.called)
+
+    def test__sync_routers_task_call_clean_stale_namespaces(self):
+        f, g = self._test__sync_routers_task(mock.Mock(return_value=mock.ANY))
+        self.assertTrue(f.called)
+        g.assert_called_with(mock.ANY, all_routers=True)
+
     def test_agent_create(self):
         l3_agent.L3NATAgent(HOSTNAME, self.conf)
 
+    def _check_device_added(self, arp_call):
+        # The device was plugged, configured and announced exactly once.
+        self.assertEqual((1, 1, [arp_call]),
+                         (self.mock_driver.plug.call_count,
+                          self.mock_driver.init_l3.call_count,
+                          self.send_arp.call_args_list))
+
     def _test_internal_network_action(self, action):
         port_id = _uuid()
         router_id = _uuid()
@@ -167,10 +342,8 @@ class TestBasicRouterOperations(base.BaseTestCase):
         if action == 'add':
             self.device_exists.return_value = False
             agent.internal_network_added(ri, port)
-            self.assertEqual(self.mock_driver.plug.call_count, 1)
-            self.assertEqual(self.mock_driver.init_l3.call_count, 1)
-            self.send_arp.assert_called_once_with(ri.ns_name, interface_name,
-                                                  '99.0.1.9')
+            self._check_device_added(
+                mock.call(ri.ns_name, interface_name, '99.0.1.9'))
         elif action == 'remove':
             self.device_exists.return_value = True
             agent.internal_network_removed(ri, port)
@@ -185,9 +358,9 @@ class TestBasicRouterOperations(base.BaseTestCase):
         self._test_internal_network_action('remove')
 
     def _test_external_gateway_action(self, action):
+        self.external_gateway_added_p.stop()
         router = self._prepare_router_data(num_internal_ports=2)
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
+        ri = self._router_info(router)
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         internal_cidrs = ['100.0.1.0/24', '200.74.0.0/16']
         ex_gw_port = {'fixed_ips': [{'ip_address': '20.0.0.30',
@@ -206,13 +379,11 @@ class TestBasicRouterOperations(base.BaseTestCase):
                                          'floating_ip_address': '192.168.1.34',
                                          'fixed_ip_address': '192.168.0.1',
                                          'port_id': _uuid()}]}
-            router[l3_constants.FLOATINGIP_KEY] = fake_fip['floatingips']
+            router[FLOATINGIP_KEY] = fake_fip['floatingips']
             agent.external_gateway_added(ri, ex_gw_port,
                                          interface_name, internal_cidrs)
-            self.assertEqual(self.mock_driver.plug.call_count, 1)
-            self.assertEqual(self.mock_driver.init_l3.call_count, 1)
-            self.send_arp.assert_called_once_with(ri.ns_name, interface_name,
-                                                  '20.0.0.30')
+            self._check_device_added(
+                mock.call(ri.ns_name, interface_name, '20.0.0.30'))
             kwargs = {'preserve_ips': ['192.168.1.34/32'],
                       'namespace': 'qrouter-' + router['id'],
                       'gateway': '20.0.0.1',
@@ -261,9 +432,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
         self._test_external_gateway_action('remove')
 
     def _check_agent_method_called(self, agent, calls, namespace):
-        self.mock_ip.netns.execute.assert_has_calls(
-            [mock.call(call, check_exit_code=False) for call in calls],
-            any_order=True)
+        self.mock_ip.netns.execute.assert_has_calls(calls, any_order=True)
 
     def _test_routing_table_update(self, namespace):
         if not namespace:
@@ -281,24 +450,20 @@ class TestBasicRouterOperations(base.BaseTestCase):
                        'nexthop': '1.2.3.4'}
 
         agent._update_routing_table(ri, 'replace', fake_route1)
-        expected = [['ip', 'route', 'replace', 'to', '135.207.0.0/16',
-                     'via', '1.2.3.4']]
-        self._check_agent_method_called(agent, expected, namespace)
+        self._check_agent_method_called(
+            agent, [_ROUTE_REPLACE_135_207_0_0], namespace)
 
         agent._update_routing_table(ri, 'delete', fake_route1)
-        expected = [['ip', 'route', 'delete', 'to', '135.207.0.0/16',
-                     'via', '1.2.3.4']]
-        self._check_agent_method_called(agent, expected, namespace)
+        self._check_agent_method_called(
+            agent, [_ROUTE_DELETE_135_207_0_0], namespace)
 
         agent._update_routing_table(ri, 'replace', fake_route2)
-        expected = [['ip', 'route', 'replace', 'to', '135.207.111.111/32',
-                     'via', '1.2.3.4']]
-        self._check_agent_method_called(agent, expected, namespace)
+        self._check_agent_method_called(
+            agent, [_ROUTE_REPLACE_135_207_111_111], namespace)
 
         agent._update_routing_table(ri, 'delete', fake_route2)
-        expected = [['ip', 'route', 'delete', 'to', '135.207.111.111/32',
-                     'via', '1.2.3.4']]
-        self._check_agent_method_called(agent, expected, namespace)
+        self._check_agent_method_called(
+            agent, [_ROUTE_DELETE_135_207_111_111], namespace)
 
     def test_agent_routing_table_updated(self):
         self._test_routing_table_update(namespace=True)
@@ -321,7 +486,6 @@ class TestBasicRouterOperations(base.BaseTestCase):
         ri = l3_agent.RouterInfo(router_id, self.conf.root_helper,
                                  self.conf.use_namespaces,
                                  {})
-        ri.router = {}
 
         fake_old_routes = []
         fake_new_routes = [{'destination': "110.100.31.0/24",
@@ -332,31 +496,25 @@ class TestBasicRouterOperations(base.BaseTestCase):
         ri.router['routes'] = fake_new_routes
         agent.routes_updated(ri)
 
-        expected = [['ip', 'route', 'replace', 'to', '110.100.30.0/24',
-                    'via', '10.100.10.30'],
-                    ['ip', 'route', 'replace', 'to', '110.100.31.0/24',
-                     'via', '10.100.10.30']]
-
-        self._check_agent_method_called(agent, expected, namespace)
+        self._check_agent_method_called(
+            agent, [_ROUTE_REPLACE_110_100_30, _ROUTE_REPLACE_110_100_31],
+            namespace)
 
         fake_new_routes = [{'destination': "110.100.30.0/24",
                             'nexthop': "10.100.10.30"}]
         ri.router['routes'] = fake_new_routes
         agent.routes_updated(ri)
-        expected = [['ip', 'route', 'delete', 'to', '110.100.31.0/24',
-                    'via', '10.100.10.30']]
-
-        self._check_agent_method_called(agent, expected, namespace)
+        self._check_agent_method_called(
+            agent, [_ROUTE_DELETE_110_100_31], namespace)
         fake_new_routes = []
         ri.router['routes'] = fake_new_routes
         agent.routes_updated(ri)
 
-        expected = [['ip', 'route', 'delete', 'to', '110.100.30.0/24',
-                    'via', '10.100.10.30']]
-        self._check_agent_method_called(agent, expected, namespace)
+        self._check_agent_method_called(
+            agent, [_ROUTE_DELETE_110_100_30], namespace)
 
     def _verify_snat_rules(self, rules, router, negate=False):
-        interfaces = router[l3_constants.INTERFACE_KEY]
+        interfaces = router[INTERFACE_KEY]
         source_cidrs = []
         for interface in interfaces:
             prefix = interface['subnet']['cidr'].split('/')[1]
@@ -368,10 +526,10 @@ class TestBasicRouterOperations(base.BaseTestCase):
         expected_rules = [
             '! -i %s ! -o %s -m conntrack ! --ctstate DNAT -j ACCEPT' %
             (interface_name, interface_name)]
+        # Create SNAT rules for IPv4 only
+        source_nat_v4 = netaddr.IPAddress(source_nat_ip).version == 4
         for source_cidr in source_cidrs:
-            # Create SNAT rules for IPv4 only
-            if (netaddr.IPNetwork(source_cidr).version == 4 and
-                netaddr.IPNetwork(source_nat_ip).version == 4):
+            if source_nat_v4 and netaddr.IPNetwork(source_cidr).version == 4:
                 value_dict = {'source_cidr': source_cidr,
                               'source_nat_ip': source_nat_ip}
                 expected_rules.append('-s %(source_cidr)s -j SNAT --to-source '
@@ -384,55 +542,38 @@ class TestBasicRouterOperations(base.BaseTestCase):
 
     def _prepare_router_data(self, ip_version=4,
                              enable_snat=None, num_internal_ports=1):
-        if ip_version == 4:
-            ip_addr = '19.4.4.4'
-            cidr = '19.4.4.0/24'
-            gateway_ip = '19.4.4.1'
-        elif ip_version == 6:
-            ip_addr = 'fd00::4'
-            cidr = 'fd00::/64'
-            gateway_ip = 'fd00::1'
-
-        router_id = _uuid()
-        ex_gw_port = {'id': _uuid(),
-                      'network_id': _uuid(),
-                      'fixed_ips': [{'ip_address': ip_addr,
-                                     'subnet_id': _uuid()}],
-                      'subnet': {'cidr': cidr,
-                                 'gateway_ip': gateway_ip}}
-        int_ports = []
+        router = copy.deepcopy(
+            _router_template(ip_version, num_internal_ports))
+        # Only the ids have to differ from one router to the next.
+        router['id'] = _uuid()
+        ex_gw_port = router['gw_port']
+        ex_gw_port['id'] = _uuid()
+        ex_gw_port['network_id'] = _uuid()
+        ex_gw_port['fixed_ips'][0]['subnet_id'] = _uuid()
         self.subnet_id_list = []
-        for i in range(num_internal_ports):
-            self.subnet_id_list.append(_uuid())
-            subnet_id = self.subnet_id_list[i]
-            int_ports.append({'id': _uuid(),
-                              'network_id': _uuid(),
-                              'admin_state_up': True,
-                              'fixed_ips': [{'ip_address': '35.4.%s.4' % i,
-                                             'subnet_id': subnet_id}],
-                              'mac_address': 'ca:fe:de:ad:be:ef',
-                              'subnet': {'cidr': '35.4.%s.0/24' % i,
-                                         'gateway_ip': '35.4.%s.1' % i}})
+        for port in router[INTERFACE_KEY]:
+            subnet_id = _uuid()
+            self.subnet_id_list.append(subnet_id)
+            port['id'] = _uuid()
+            port['network_id'] = _uuid()
+            port['fixed_ips'][0]['subnet_id'] = subnet_id
 
-        router = {
-            'id': router_id,
-            'distributed': False,
-            l3_constants.INTERFACE_KEY: int_ports,
-            'routes': [],
-            'gw_port': ex_gw_port}
         if enable_snat is not None:
             router['enable_snat'] = enable_snat
         return router
 
+    def _router_info(self, router):
+        return l3_agent.RouterInfo(router['id'], self.conf.root_helper,
+                                   self.conf.use_namespaces, router=router)
+
     def test__map_internal_interfaces(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data(num_internal_ports=4)
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
+        ri = self._router_info(router)
         test_port = {'mac_address': '00:12:23:34:45:56',
                      'fixed_ips': [{'subnet_id': self.subnet_id_list[0],
                                     'ip_address': '101.12.13.14'}]}
-        internal_ports = ri.router.get(l3_constants.INTERFACE_KEY, [])
+        internal_ports = ri.router.get(INTERFACE_KEY, [])
         # test valid case
         res_port = agent._map_internal_interfaces(ri,
                                                   internal_ports[0],
@@ -449,8 +590,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
     def test_get_internal_port(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data(num_internal_ports=4)
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
+        ri = self._router_info(router)
 
         # Test Basic cases
         port = agent.get_internal_port(ri, self.subnet_id_list[0])
@@ -478,9 +618,8 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data(num_internal_ports=2)
         router['distributed'] = True
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        ports = ri.router.get(l3_constants.INTERFACE_KEY, [])
+        ri = self._router_info(router)
+        ports = ri.router.get(INTERFACE_KEY, [])
         test_ports = [{'mac_address': '00:11:22:33:44:55',
                       'device_owner': 'network:dhcp',
                       'subnet_id': self.subnet_id_list[0],
@@ -532,33 +671,17 @@ class TestBasicRouterOperations(base.BaseTestCase):
 
     def test_process_cent_router(self):
         router = self._prepare_router_data()
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
+        ri = self._router_info(router)
         self._test_process_router(ri)
 
     def test_process_dist_router(self):
         router = self._prepare_router_data()
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
+        ri = self._router_info(router)
         ri.router['distributed'] = True
         ri.router['gw_port_host'] = None
         self._test_process_router(ri)
 
-    def _test_process_router(self, ri):
-        router = ri.router
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        fake_fip_id = 'fake_fip_id'
-        agent.process_router_floating_ip_addresses = mock.Mock()
-        agent.process_router_floating_ip_nat_rules = mock.Mock()
-        agent.process_router_floating_ip_addresses.return_value = {
-            fake_fip_id: 'ACTIVE'}
-        agent.external_gateway_added = mock.Mock()
-        fake_floatingips1 = {'floatingips': [
-            {'id': fake_fip_id,
-             'floating_ip_address': '8.8.8.8',
-             'fixed_ip_address': '7.7.7.7',
-             'port_id': _uuid()}]}
-        agent.process_router(ri)
+    def _check_floating_ips_processed(self, agent, ri):
         ex_gw_port = agent._get_ex_gw_port(ri)
         agent.process_router_floating_ip_addresses.assert_called_with(
             ri, ex_gw_port)
@@ -566,62 +689,48 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent.process_router_floating_ip_nat_rules.assert_called_with(ri)
         agent.process_router_floating_ip_nat_rules.reset_mock()
 
-        # remap floating IP to a new fixed ip
-        fake_floatingips2 = copy.deepcopy(fake_floatingips1)
-        fake_floatingips2['floatingips'][0]['fixed_ip_address'] = '7.7.7.8'
-
-        router[l3_constants.FLOATINGIP_KEY] = fake_floatingips2['floatingips']
+    def _test_process_router(self, ri):
+        router = ri.router
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        fake_fip_id = 'fake_fip_id'
+        agent.process_router_floating_ip_addresses = mock.Mock(
+            return_value={fake_fip_id: 'ACTIVE'})
+        agent.process_router_floating_ip_nat_rules = mock.Mock()
+        router[FLOATINGIP_KEY] = [
+            {'id': fake_fip_id,
+             'floating_ip_address': '8.8.8.8',
+             'fixed_ip_address': '7.7.7.8',
+             'port_id': _uuid()}]
         agent.process_router(ri)
-        ex_gw_port = agent._get_ex_gw_port(ri)
-        agent.process_router_floating_ip_addresses.assert_called_with(
-            ri, ex_gw_port)
-        agent.process_router_floating_ip_addresses.reset_mock()
-        agent.process_router_floating_ip_nat_rules.assert_called_with(ri)
-        agent.process_router_floating_ip_nat_rules.reset_mock()
+        self._check_floating_ips_processed(agent, ri)
 
         # remove just the floating ips
-        del router[l3_constants.FLOATINGIP_KEY]
+        del router[FLOATINGIP_KEY]
         agent.process_router(ri)
-        ex_gw_port = agent._get_ex_gw_port(ri)
-        agent.process_router_floating_ip_addresses.assert_called_with(
-            ri, ex_gw_port)
-        agent.process_router_floating_ip_addresses.reset_mock()
-        agent.process_router_floating_ip_nat_rules.assert_called_with(ri)
-        agent.process_router_floating_ip_nat_rules.reset_mock()
+        self._check_floating_ips_processed(agent, ri)
 
         # now no ports so state is torn down
-        del router[l3_constants.INTERFACE_KEY]
+        del router[INTERFACE_KEY]
         del router['gw_port']
         agent.process_router(ri)
         self.assertEqual(self.send_arp.call_count, 1)
         self.assertFalse(agent.process_router_floating_ip_addresses.called)
         self.assertFalse(agent.process_router_floating_ip_nat_rules.called)
 
-    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
-    def _test_process_router_floating_ip_addresses_add(self, ri,
-                                                       agent, IPDevice):
-        floating_ips = ri.router.get(l3_constants.FLOATINGIP_KEY, [])
+    def _test_process_router_floating_ip_addresses_add(self, ri, agent):
+        floating_ips = ri.router.get(FLOATINGIP_KEY, [])
         fip_id = floating_ips[0]['id']
-        IPDevice.return_value = device = mock.Mock()
+        device = self.mock_ip_dev
         device.addr.list.return_value = []
-        ri.iptables_manager.ipv4['nat'] = mock.MagicMock()
 
         fip_statuses = agent.process_router_floating_ip_addresses(
             ri, {'id': _uuid()})
-        self.assertEqual({fip_id: l3_constants.FLOATINGIP_STATUS_ACTIVE},
+        self.assertEqual({fip_id: FLOATINGIP_STATUS_ACTIVE},
                          fip_statuses)
         device.addr.add.assert_called_once_with(4, '15.1.2.3/32', '15.1.2.3')
 
     def test_process_router_floating_ip_nat_rules_add(self):
-        fip = {
-            'id': _uuid(), 'port_id': _uuid(),
-            'floating_ip_address': '15.1.2.3',
-            'fixed_ip_address': '192.168.0.1'
-        }
-
-        ri = mock.MagicMock()
-        ri.router.get.return_value = [fip]
-        ri.router['distributed'].__nonzero__ = lambda self: False
+        ri = FakeRouterInfo(floating_ips=[_floating_ip()])
 
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
 
@@ -630,61 +739,38 @@ class TestBasicRouterOperations(base.BaseTestCase):
         nat = ri.iptables_manager.ipv4['nat']
         nat.clear_rules_by_tag.assert_called_once_with('floating_ip')
         rules = agent.floating_forward_rules('15.1.2.3', '192.168.0.1')
-        for chain, rule in rules:
-            nat.add_rule.assert_any_call(chain, rule, tag='floating_ip')
+        # Compare sets rather than scanning the calls once per rule.
+        added = set((args, tuple(sorted(kwargs.items())))
+                    for args, kwargs in nat.add_rule.call_args_list)
+        expected = set((rule, (('tag', 'floating_ip'),)) for rule in rules)
+        self.assertEqual(set(), expected - added)
 
     def test_process_router_cent_floating_ip_add(self):
-        fake_floatingips = {'floatingips': [
-            {'id': _uuid(),
-             'floating_ip_address': '15.1.2.3',
-             'fixed_ip_address': '192.168.0.1',
-             'port_id': _uuid()}]}
-
         router = self._prepare_router_data(enable_snat=True)
-        router[l3_constants.FLOATINGIP_KEY] = fake_floatingips['floatingips']
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        ri.iptables_manager.ipv4['nat'] = mock.MagicMock()
+        router[FLOATINGIP_KEY] = [_floating_ip()]
+        ri = self._router_info(router)
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         self._test_process_router_floating_ip_addresses_add(ri, agent)
 
     def test_process_router_dist_floating_ip_add(self):
-        fake_floatingips = {'floatingips': [
-            {'id': _uuid(),
-             'host': HOSTNAME,
-             'floating_ip_address': '15.1.2.3',
-             'fixed_ip_address': '192.168.0.1',
-             'floating_network_id': _uuid(),
-             'port_id': _uuid()}]}
-
         router = self._prepare_router_data(enable_snat=True)
-        router[l3_constants.FLOATINGIP_KEY] = fake_floatingips['floatingips']
+        router[FLOATINGIP_KEY] = [
+            _floating_ip(host=HOSTNAME, floating_network_id=_uuid())]
         router['distributed'] = True
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        ri.iptables_manager.ipv4['nat'] = mock.MagicMock()
+        # Keep the real nat table: the DVR path links the router to the
+        # fip namespace and applies its iptables rules.
+        ri = self._router_info(router)
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.host = HOSTNAME
-        agent.agent_gateway_port = (
-            {'fixed_ips': [{'ip_address': '20.0.0.30',
-             'subnet_id': _uuid()}],
-             'subnet': {'gateway_ip': '20.0.0.1'},
-             'id': _uuid(),
-             'network_id': _uuid(),
-             'mac_address': 'ca:fe:de:ad:be:ef',
-             'ip_cidr': '20.0.0.30/24'}
-        )
+        agent.agent_gateway_port = copy.deepcopy(_AGENT_GW_PORT)
         self._test_process_router_floating_ip_addresses_add(ri, agent)
 
     # TODO(mrsmith): refactor for DVR cases
-    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
-    def test_process_router_floating_ip_addresses_remove(self, IPDevice):
-        IPDevice.return_value = device = mock.Mock()
+    def test_process_router_floating_ip_addresses_remove(self):
+        device = self.mock_ip_dev
         device.addr.list.return_value = [{'cidr': '15.1.2.3/32'}]
 
-        ri = mock.MagicMock()
-        ri.router.get.return_value = []
-        ri.router['distributed'].__nonzero__ = lambda self: False
+        ri = FakeRouterInfo()
 
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
 
@@ -694,55 +780,39 @@ class TestBasicRouterOperations(base.BaseTestCase):
         device.addr.delete.assert_called_once_with(4, '15.1.2.3/32')
 
     def test_process_router_floating_ip_nat_rules_remove(self):
-        ri = mock.MagicMock()
-        ri.router.get.return_value = []
+        ri = FakeRouterInfo()
 
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
 
         agent.process_router_floating_ip_nat_rules(ri)
 
         nat = ri.iptables_manager.ipv4['nat']
-        nat = ri.iptables_manager.ipv4['nat`']
         nat.clear_rules_by_tag.assert_called_once_with('floating_ip')
 
-    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
-    def test_process_router_floating_ip_addresses_remap(self, IPDevice):
-        fip_id = _uuid()
-        fip = {
-            'id': fip_id, 'port_id': _uuid(),
-            'floating_ip_address': '15.1.2.3',
-            'fixed_ip_address': '192.168.0.2'
-        }
+    def test_process_router_floating_ip_addresses_remap(self):
+        fip = _floating_ip(fixed_ip_address='192.168.0.2')
+        fip_id = fip['id']
 
-        IPDevice.return_value = device = mock.Mock()
+        device = self.mock_ip_dev
         device.addr.list.return_value = [{'cidr': '15.1.2.3/32'}]
-        ri = mock.MagicMock()
-        ri.router['distributed'].__nonzero__ = lambda self: False
-
-        ri.router.get.return_value = [fip]
+        ri = FakeRouterInfo(floating_ips=[fip])
 
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
 
         fip_statuses = agent.process_router_floating_ip_addresses(
             ri, {'id': _uuid()})
-        self.assertEqual({fip_id: l3_constants.FLOATINGIP_STATUS_ACTIVE},
+        self.assertEqual({fip_id: FLOATINGIP_STATUS_ACTIVE},
                          fip_statuses)
 
         self.assertFalse(device.addr.add.called)
         self.assertFalse(device.addr.delete.called)
 
-    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
-    def test_process_router_with_disabled_floating_ip(self, IPDevice):
-        fip_id = _uuid()
-        fip = {
-            'id': fip_id, 'port_id': _uuid(),
-            'floating_ip_address': '15.1.2.3',
-            'fixed_ip_address': '192.168.0.2'
-        }
+    def test_process_router_with_disabled_floating_ip(self):
+        fip = _floating_ip(fixed_ip_address='192.168.0.2')
+        fip_id = fip['id']
 
-        ri = mock.MagicMock()
+        ri = FakeRouterInfo()
         ri.floating_ips = [fip]
-        ri.router.get.return_value = []
 
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
 
@@ -751,35 +821,26 @@ class TestBasicRouterOperations(base.BaseTestCase):
 
         self.assertIsNone(fip_statuses.get(fip_id))
 
-    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
-    def test_process_router_floating_ip_with_device_add_error(self, IPDevice):
-        IPDevice.return_value = device = mock.Mock()
+    def test_process_router_floating_ip_with_device_add_error(self):
+        device = self.mock_ip_dev
         device.addr.add.side_effect = processutils.ProcessExecutionError
         device.addr.list.return_value = []
-        fip_id = _uuid()
-        fip = {
-            'id': fip_id, 'port_id': _uuid(),
-            'floating_ip_address': '15.1.2.3',
-            'fixed_ip_address': '192.168.0.2'
-        }
-        ri = mock.MagicMock()
-        ri.router.get.return_value = [fip]
-        ri.router['distributed'].__nonzero__ = lambda self: False
+        fip = _floating_ip(fixed_ip_address='192.168.0.2')
+        fip_id = fip['id']
+        ri = FakeRouterInfo(floating_ips=[fip])
 
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
 
         fip_statuses = agent.process_router_floating_ip_addresses(
             ri, {'id': _uuid()})
 
-        self.assertEqual({fip_id: l3_constants.FLOATINGIP_STATUS_ERROR},
+        self.assertEqual({fip_id: FLOATINGIP_STATUS_ERROR},
                          fip_statuses)
 
     def test_process_router_snat_disabled(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data(enable_snat=True)
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent.external_gateway_added = mock.Mock()
+        ri = self._router_info(router)
         # Process with NAT
         agent.process_router(ri)
         orig_nat_rules = ri.iptables_manager.ipv4['nat'].rules[:]
@@ -788,10 +849,8 @@ class TestBasicRouterOperations(base.BaseTestCase):
         # Reassign the router object to RouterInfo
         ri.router = router
         agent.process_router(ri)
-        # For some reason set logic does not work well with
-        # IpTablesRule instances
-        nat_rules_delta = [r for r in orig_nat_rules
-                           if r not in ri.iptables_manager.ipv4['nat'].rules]
+        nat_rules_delta = _rules_missing_from(
+            orig_nat_rules, ri.iptables_manager.ipv4['nat'].rules)
         self.assertEqual(len(nat_rules_delta), 2)
         self._verify_snat_rules(nat_rules_delta, router)
         self.assertEqual(self.send_arp.call_count, 1)
@@ -799,9 +858,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
     def test_process_router_snat_enabled(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data(enable_snat=False)
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent.external_gateway_added = mock.Mock()
+        ri = self._router_info(router)
         # Process without NAT
         agent.process_router(ri)
         orig_nat_rules = ri.iptables_manager.ipv4['nat'].rules[:]
@@ -810,61 +867,74 @@ class TestBasicRouterOperations(base.BaseTestCase):
         # Reassign the router object to RouterInfo
         ri.router = router
         agent.process_router(ri)
-        # For some reason set logic does not work well with
-        # IpTablesRule instances
-        nat_rules_delta = [r for r in ri.iptables_manager.ipv4['nat'].rules
-                           if r not in orig_nat_rules]
+        nat_rules_delta = _rules_missing_from(
+            ri.iptables_manager.ipv4['nat'].rules, orig_nat_rules)
         self.assertEqual(len(nat_rules_delta), 2)
         self._verify_snat_rules(nat_rules_delta, router)
         self.assertEqual(self.send_arp.call_count, 1)
 
-    def test_process_router_interface_added(self):
+    def _test_process_router_interface_change(self, change_interfaces,
+                                              num_internal_ports=1):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        router = self._prepare_router_data()
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent.external_gateway_added = mock.Mock()
+        router = self._prepare_router_data(
+            num_internal_ports=num_internal_ports)
+        ri = self._router_info(router)
         # Process with NAT
         agent.process_router(ri)
         orig_nat_rules = ri.iptables_manager.ipv4['nat'].rules[:]
-        # Add an interface and reprocess
-        router[l3_constants.INTERFACE_KEY].append(
-            {'id': _uuid(),
-             'network_id': _uuid(),
-             'admin_state_up': True,
-             'fixed_ips': [{'ip_address': '35.4.1.4',
-                            'subnet_id': _uuid()}],
-             'mac_address': 'ca:fe:de:ad:be:ef',
-             'subnet': {'cidr': '35.4.1.0/24',
-                        'gateway_ip': '35.4.1.1'}})
+        change_interfaces(router[INTERFACE_KEY])
         # Reassign the router object to RouterInfo
         ri.router = router
         agent.process_router(ri)
-        # For some reason set logic does not work well with
-        # IpTablesRule instances
-        nat_rules_delta = [r for r in ri.iptables_manager.ipv4['nat'].rules
-                           if r not in orig_nat_rules]
+        nat_rules = ri.iptables_manager.ipv4['nat'].rules
+        added = _rules_missing_from(nat_rules, orig_nat_rules)
+        removed = _rules_missing_from(orig_nat_rules, nat_rules)
+        return router, added, removed
+
+    def test_process_router_interface_added(self):
+        router, nat_rules_delta, _ = (
+            self._test_process_router_interface_change(
+                lambda ports: ports.append(copy.deepcopy(_IPV4_PORT))))
         self.assertEqual(len(nat_rules_delta), 1)
         self._verify_snat_rules(nat_rules_delta, router)
         # send_arp is called both times process_router is called
         self.assertEqual(self.send_arp.call_count, 2)
 
+    def test_process_router_ipv6_interface_added(self):
+        _, nat_rules_delta, _ = self._test_process_router_interface_change(
+            lambda ports: ports.append(copy.deepcopy(_IPV6_PORT)))
+        self.assertFalse(nat_rules_delta)
+
+    def test_process_router_ipv6v4_interface_added(self):
+        router, nat_rules_delta, _ = (
+            self._test_process_router_interface_change(
+                lambda ports: ports.extend(
+                    copy.deepcopy([_IPV4_PORT, _IPV6_PORT]))))
+        self.assertEqual(1, len(nat_rules_delta))
+        self._verify_snat_rules(nat_rules_delta, router)
+
+    def test_process_router_interface_removed(self):
+        router, _, nat_rules_delta = (
+            self._test_process_router_interface_change(
+                lambda ports: ports.pop(1), num_internal_ports=2))
+        self.assertEqual(len(nat_rules_delta), 1)
+        self._verify_snat_rules(nat_rules_delta, router, negate=True)
+        # send_arp is called both times process_router is called
+        self.assertEqual(self.send_arp.call_count, 2)
+
     def test_process_ipv6_only_gw(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data(ip_version=6)
         # Get NAT rules without the gw_port
         gw_port = router['gw_port']
         router['gw_port'] = None
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent.external_gateway_added = mock.Mock()
+        ri = self._router_info(router)
         agent.process_router(ri)
         orig_nat_rules = ri.iptables_manager.ipv4['nat'].rules[:]
 
         # Get NAT rules with the gw_port
         router['gw_port'] = gw_port
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
+        ri = self._router_info(router)
         with mock.patch.object(
                 agent,
                 'external_gateway_nat_rules') as external_gateway_nat_rules:
@@ -875,102 +945,10 @@ class TestBasicRouterOperations(base.BaseTestCase):
             self.assertFalse(external_gateway_nat_rules.called)
             self.assertEqual(orig_nat_rules, new_nat_rules)
 
-    def test_process_router_ipv6_interface_added(self):
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        router = self._prepare_router_data()
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent.external_gateway_added = mock.Mock()
-        # Process with NAT
-        agent.process_router(ri)
-        orig_nat_rules = ri.iptables_manager.ipv4['nat'].rules[:]
-        # Add an IPv6 interface and reprocess
-        router[l3_constants.INTERFACE_KEY].append(
-            {'id': _uuid(),
-             'network_id': _uuid(),
-             'admin_state_up': True,
-             'fixed_ips': [{'ip_address': 'fd00::2',
-                            'subnet_id': _uuid()}],
-             'mac_address': 'ca:fe:de:ad:be:ef',
-             'subnet': {'cidr': 'fd00::/64',
-                        'gateway_ip': 'fd00::1'}})
-        # Reassign the router object to RouterInfo
-        ri.router = router
-        agent.process_router(ri)
-        # For some reason set logic does not work well with
-        # IpTablesRule instances
-        nat_rules_delta = [r for r in ri.iptables_manager.ipv4['nat'].rules
-                           if r not in orig_nat_rules]
-        self.assertFalse(nat_rules_delta)
-
-    def test_process_router_ipv6v4_interface_added(self):
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        router = self._prepare_router_data()
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent.external_gateway_added = mock.Mock()
-        # Process with NAT
-        agent.process_router(ri)
-        orig_nat_rules = ri.iptables_manager.ipv4['nat'].rules[:]
-        # Add an IPv4 and IPv6 interface and reprocess
-        router[l3_constants.INTERFACE_KEY].append(
-            {'id': _uuid(),
-             'network_id': _uuid(),
-             'admin_state_up': True,
-             'fixed_ips': [{'ip_address': '35.4.1.4',
-                            'subnet_id': _uuid()}],
-             'mac_address': 'ca:fe:de:ad:be:ef',
-             'subnet': {'cidr': '35.4.1.0/24',
-                        'gateway_ip': '35.4.1.1'}})
-
-        router[l3_constants.INTERFACE_KEY].append(
-            {'id': _uuid(),
-             'network_id': _uuid(),
-             'admin_state_up': True,
-             'fixed_ips': [{'ip_address': 'fd00::2',
-                            'subnet_id': _uuid()}],
-             'mac_address': 'ca:fe:de:ad:be:ef',
-             'subnet': {'cidr': 'fd00::/64',
-                        'gateway_ip': 'fd00::1'}})
-        # Reassign the router object to RouterInfo
-        ri.router = router
-        agent.process_router(ri)
-        # For some reason set logic does not work well with
-        # IpTablesRule instances
-        nat_rules_delta = [r for r in ri.iptables_manager.ipv4['nat'].rules
-                           if r not in orig_nat_rules]
-        self.assertEqual(1, len(nat_rules_delta))
-        self._verify_snat_rules(nat_rules_delta, router)
-
-    def test_process_router_interface_removed(self):
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        router = self._prepare_router_data(num_internal_ports=2)
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent.external_gateway_added = mock.Mock()
-        # Process with NAT
-        agent.process_router(ri)
-        orig_nat_rules = ri.iptables_manager.ipv4['nat'].rules[:]
-        # Add an interface and reprocess
-        del router[l3_constants.INTERFACE_KEY][1]
-        # Reassign the router object to RouterInfo
-        ri.router = router
-        agent.process_router(ri)
-        # For some reason set logic does not work well with
-        # IpTablesRule instances
-        nat_rules_delta = [r for r in orig_nat_rules
-                           if r not in ri.iptables_manager.ipv4['nat'].rules]
-        self.assertEqual(len(nat_rules_delta), 1)
-        self._verify_snat_rules(nat_rules_delta, router, negate=True)
-        # send_arp is called both times process_router is called
-        self.assertEqual(self.send_arp.call_count, 2)
-
     def test_process_router_internal_network_added_unexpected_error(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data()
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent.external_gateway_added = mock.Mock()
+        ri = self._router_info(router)
         with mock.patch.object(
                 l3_agent.L3NATAgent,
                 'internal_network_added') as internal_network_added:
@@ -979,7 +957,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
             internal_network_added.side_effect = RuntimeError
             self.assertRaises(RuntimeError, agent.process_router, ri)
             self.assertNotIn(
-                router[l3_constants.INTERFACE_KEY][0], ri.internal_ports)
+                router[INTERFACE_KEY][0], ri.internal_ports)
 
             # The unexpected exception has been fixed manually
             internal_network_added.side_effect = None
@@ -989,14 +967,12 @@ class TestBasicRouterOperations(base.BaseTestCase):
             agent.process_router(ri)
             # We were able to add the port to ri.internal_ports
             self.assertIn(
-                router[l3_constants.INTERFACE_KEY][0], ri.internal_ports)
+                router[INTERFACE_KEY][0], ri.internal_ports)
 
     def test_process_router_internal_network_removed_unexpected_error(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data()
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent.external_gateway_added = mock.Mock()
+        ri = self._router_info(router)
         # add an internal port
         agent.process_router(ri)
 
@@ -1010,7 +986,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
             # The above port is set to down state, remove it.
             self.assertRaises(RuntimeError, agent.process_router, ri)
             self.assertIn(
-                router[l3_constants.INTERFACE_KEY][0], ri.internal_ports)
+                router[INTERFACE_KEY][0], ri.internal_ports)
 
             # The unexpected exception has been fixed manually
             internal_net_removed.side_effect = None
@@ -1020,69 +996,59 @@ class TestBasicRouterOperations(base.BaseTestCase):
             agent.process_router(ri)
             # We were able to remove the port from ri.internal_ports
             self.assertNotIn(
-                router[l3_constants.INTERFACE_KEY][0], ri.internal_ports)
+                router[INTERFACE_KEY][0], ri.internal_ports)
 
     def test_process_router_floatingip_disabled(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        with mock.patch.object(
-            agent.plugin_rpc,
-            'update_floatingip_statuses') as mock_update_fip_status:
-            fip_id = _uuid()
-            router = self._prepare_router_data(num_internal_ports=1)
-            router[l3_constants.FLOATINGIP_KEY] = [
-                {'id': fip_id,
-                 'floating_ip_address': '8.8.8.8',
-                 'fixed_ip_address': '7.7.7.7',
-                 'port_id': router[l3_constants.INTERFACE_KEY][0]['id']}]
-
-            ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                     self.conf.use_namespaces, router=router)
-            agent.external_gateway_added = mock.Mock()
-            agent.process_router(ri)
-            # Assess the call for putting the floating IP up was performed
-            mock_update_fip_status.assert_called_once_with(
-                mock.ANY, ri.router_id,
-                {fip_id: l3_constants.FLOATINGIP_STATUS_ACTIVE})
-            mock_update_fip_status.reset_mock()
-            # Process the router again, this time without floating IPs
-            router[l3_constants.FLOATINGIP_KEY] = []
-            ri.router = router
-            agent.process_router(ri)
-            # Assess the call for putting the floating IP up was performed
-            mock_update_fip_status.assert_called_once_with(
-                mock.ANY, ri.router_id,
-                {fip_id: l3_constants.FLOATINGIP_STATUS_DOWN})
+        mock_update_fip_status = self.plugin_api.update_floatingip_statuses
+        fip_id = _uuid()
+        router = self._prepare_router_data(num_internal_ports=1)
+        router[FLOATINGIP_KEY] = [
+            {'id': fip_id,
+             'floating_ip_address': '8.8.8.8',
+             'fixed_ip_address': '7.7.7.7',
+             'port_id': router[INTERFACE_KEY][0]['id']}]
+
+        ri = self._router_info(router)
+        agent.process_router(ri)
+        # Process the router again, this time without floating IPs
+        router[FLOATINGIP_KEY] = []
+        ri.router = router
+        agent.process_router(ri)
+        # The floating IP was put up by the first pass and down by the
+        # second, with exactly one status update per pass
+        self.assertEqual(
+            [mock.call(mock.ANY, ri.router_id,
+                       {fip_id: FLOATINGIP_STATUS_ACTIVE}),
+             mock.call(mock.ANY, ri.router_id,
+                       {fip_id: FLOATINGIP_STATUS_DOWN})],
+            mock_update_fip_status.call_args_list)
 
     def test_process_router_floatingip_exception(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        agent.process_router_floating_ip_addresses = mock.Mock()
-        agent.process_router_floating_ip_addresses.side_effect = RuntimeError
-        with mock.patch.object(
-            agent.plugin_rpc,
-            'update_floatingip_statuses') as mock_update_fip_status:
-            fip_id = _uuid()
-            router = self._prepare_router_data(num_internal_ports=1)
-            router[l3_constants.FLOATINGIP_KEY] = [
-                {'id': fip_id,
-                 'floating_ip_address': '8.8.8.8',
-                 'fixed_ip_address': '7.7.7.7',
-                 'port_id': router[l3_constants.INTERFACE_KEY][0]['id']}]
-
-            ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                     self.conf.use_namespaces, router=router)
-            agent.external_gateway_added = mock.Mock()
-            agent.process_router(ri)
-            # Assess the call for putting the floating IP into Error
-            # was performed
-            mock_update_fip_status.assert_called_once_with(
-                mock.ANY, ri.router_id,
-                {fip_id: l3_constants.FLOATINGIP_STATUS_ERROR})
+        agent.process_router_floating_ip_addresses = mock.Mock(
+            side_effect=RuntimeError)
+        mock_update_fip_status = self.plugin_api.update_floatingip_statuses
+        fip_id = _uuid()
+        router = self._prepare_router_data(num_internal_ports=1)
+        router[FLOATINGIP_KEY] = [
+            {'id': fip_id,
+             'floating_ip_address': '8.8.8.8',
+             'fixed_ip_address': '7.7.7.7',
+             'port_id': router[INTERFACE_KEY][0]['id']}]
+
+        ri = self._router_info(router)
+        agent.process_router(ri)
+        # Assess the call for putting the floating IP into Error
+        # was performed
+        mock_update_fip_status.assert_called_once_with(
+            mock.ANY, ri.router_id,
+            {fip_id: FLOATINGIP_STATUS_ERROR})
 
     def test_handle_router_snat_rules_add_back_jump(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        ri = mock.MagicMock()
+        ri = FakeRouterInfo()
         port = {'fixed_ips': [{'ip_address': '192.168.1.4'}]}
-        ri.router = {'distributed': False}
 
         agent._handle_router_snat_rules(ri, port, [], "iface", "add_rules")
 
@@ -1099,14 +1065,14 @@ class TestBasicRouterOperations(base.BaseTestCase):
     def test_handle_router_snat_rules_add_rules(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         ri = l3_agent.RouterInfo(_uuid(), self.conf.root_helper,
-                                 self.conf.use_namespaces, {})
+                                 self.conf.use_namespaces,
+                                 {'distributed': False})
         ex_gw_port = {'fixed_ips': [{'ip_address': '192.168.1.4'}]}
         internal_cidrs = ['10.0.0.0/24']
-        ri.router = {'distributed': False}
         agent._handle_router_snat_rules(ri, ex_gw_port, internal_cidrs,
                                         "iface", "add_rules")
 
-        nat_rules = map(str, ri.iptables_manager.ipv4['nat'].rules)
+        nat_rules = [str(r) for r in ri.iptables_manager.ipv4['nat'].rules]
         wrap_name = ri.iptables_manager.wrap_name
 
         jump_float_rule = "-A %s-snat -j %s-float-snat" % (wrap_name,
@@ -1137,42 +1103,31 @@ class TestBasicRouterOperations(base.BaseTestCase):
 
         router = self._prepare_router_data(enable_snat=True,
                                            num_internal_ports=1)
-        ri = l3_agent.RouterInfo(router['id'],
-                                 self.conf.root_helper,
-                                 self.conf.use_namespaces,
-                                 router=router)
+        ri = self._router_info(router)
 
-        internal_ports = ri.router.get(l3_constants.INTERFACE_KEY, [])
+        internal_ports = ri.router.get(INTERFACE_KEY, [])
         self.assertEqual(len(internal_ports), 1)
         internal_port = internal_ports[0]
 
-        with contextlib.nested(mock.patch.object(l3_agent.L3NATAgent,
-                                                 'internal_network_removed'),
-                               mock.patch.object(l3_agent.L3NATAgent,
-                                                 'internal_network_added'),
-                               mock.patch.object(l3_agent.L3NATAgent,
-                                                 'external_gateway_removed'),
-                               mock.patch.object(l3_agent.L3NATAgent,
-                                                 'external_gateway_added')
-                               ) as (internal_network_removed,
-                                     internal_network_added,
-                                     external_gateway_removed,
-                                     external_gateway_added):
+        # The agent is local to the test, so nothing has to be restored.
+        agent.internal_network_removed = mock.Mock()
+        agent.internal_network_added = mock.Mock()
+        agent.external_gateway_removed = mock.Mock()
 
-            agent.process_router(ri)
+        agent.process_router(ri)
 
-            self.assertEqual(external_gateway_added.call_count, 1)
-            self.assertFalse(external_gateway_removed.called)
-            self.assertFalse(internal_network_removed.called)
-            internal_network_added.assert_called_once_with(
-                ri, internal_port)
-            self.assertEqual(self.mock_driver.unplug.call_count,
-                             len(stale_devnames))
-            calls = [mock.call(stale_devname,
-                               namespace=ri.ns_name,
-                               prefix=l3_agent.INTERNAL_DEV_PREFIX)
-                     for stale_devname in stale_devnames]
-            self.mock_driver.unplug.assert_has_calls(calls, any_order=True)
+        self.assertEqual(self.external_gateway_added.call_count, 1)
+        self.assertFalse(agent.external_gateway_removed.called)
+        self.assertFalse(agent.internal_network_removed.called)
+        agent.internal_network_added.assert_called_once_with(
+            ri, internal_port)
+        # The stale devices are unplugged in set order.
+        calls = [mock.call(stale_devname,
+                           namespace=ri.ns_name,
+                           prefix=l3_agent.INTERNAL_DEV_PREFIX)
+                 for stale_devname in stale_devnames]
+        self.assertEqual(sorted(calls),
+                         sorted(self.mock_driver.unplug.call_args_list))
 
     def test_process_router_delete_stale_external_devices(self):
         class FakeDev(object):
@@ -1186,44 +1141,40 @@ class TestBasicRouterOperations(base.BaseTestCase):
         router = self._prepare_router_data(enable_snat=True,
                                            num_internal_ports=1)
         del router['gw_port']
-        ri = l3_agent.RouterInfo(router['id'],
-                                 self.conf.root_helper,
-                                 self.conf.use_namespaces,
-                                 router=router)
+        ri = self._router_info(router)
 
         self.mock_ip.get_devices.return_value = stale_devlist
 
         agent.process_router(ri)
 
-        self.mock_driver.unplug.assert_called_with(
-            stale_devnames[0],
-            bridge="br-ex",
-            namespace=ri.ns_name,
-            prefix=l3_agent.EXTERNAL_DEV_PREFIX)
+        self.assertEqual([mock.call(stale_devnames[0],
+                                    bridge="br-ex",
+                                    namespace=ri.ns_name,
+                                    prefix=l3_agent.EXTERNAL_DEV_PREFIX)],
+                         self.mock_driver.unplug.call_args_list)
 
-    def test_router_deleted(self):
+    def _test_router_notification(self, notify, payload, queue):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        agent.router_deleted(None, FAKE_ID)
+        getattr(agent, notify)(None, payload)
         # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.removed_routers)
+        self.assertIn(FAKE_ID, getattr(agent, queue))
+
+    def test_router_deleted(self):
+        self._test_router_notification('router_deleted', FAKE_ID,
+                                       'removed_routers')
 
     def test_routers_updated(self):
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        agent.routers_updated(None, [FAKE_ID])
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.updated_routers)
+        self._test_router_notification('routers_updated', [FAKE_ID],
+                                       'updated_routers')
 
     def test_removed_from_agent(self):
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        agent.router_removed_from_agent(None, {'router_id': FAKE_ID})
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.removed_routers)
+        self._test_router_notification('router_removed_from_agent',
+                                       {'router_id': FAKE_ID},
+                                       'removed_routers')
 
     def test_added_to_agent(self):
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        agent.router_added_to_agent(None, [FAKE_ID])
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.updated_routers)
+        self._test_router_notification('router_added_to_agent', [FAKE_ID],
+                                       'updated_routers')
 
     def test_process_router_delete(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
@@ -1259,10 +1210,9 @@ class TestBasicRouterOperations(base.BaseTestCase):
 
         agent._destroy_fip_namespace(namespaces[0])
         # TODO(mrsmith): update for fr interface
-        self.assertEqual(self.mock_driver.unplug.call_count, 1)
-        self.mock_driver.unplug.assert_called_with('fg-aaaa', bridge='br-ex',
-                                                   prefix='fg-',
-                                                   namespace='qrouter-foo')
+        self.assertEqual([mock.call('fg-aaaa', bridge='br-ex',
+                                    prefix='fg-', namespace='qrouter-foo')],
+                         self.mock_driver.unplug.call_args_list)
 
     def test_destroy_router_namespace_skips_ns_removal(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
@@ -1284,20 +1234,19 @@ class TestBasicRouterOperations(base.BaseTestCase):
                   'external_gateway_info': {},
                   'routes': [],
                   'distributed': False}
-        with mock.patch.object(
-            agent, '_destroy_metadata_proxy') as destroy_proxy:
-            with mock.patch.object(
-                agent, '_spawn_metadata_proxy') as spawn_proxy:
-                agent._router_added(router_id, router)
-                if enableflag:
-                    spawn_proxy.assert_called_with(mock.ANY, mock.ANY)
-                else:
-                    self.assertFalse(spawn_proxy.call_count)
-                agent._router_removed(router_id)
-                if enableflag:
-                    destroy_proxy.assert_called_with(mock.ANY, mock.ANY)
-                else:
-                    self.assertFalse(destroy_proxy.call_count)
+        # The agent is local to the test, so nothing has to be restored.
+        destroy_proxy = agent._destroy_metadata_proxy = mock.Mock()
+        spawn_proxy = agent._spawn_metadata_proxy = mock.Mock()
+        agent._router_added(router_id, router)
+        if enableflag:
+            spawn_proxy.assert_called_with(mock.ANY, mock.ANY)
+        else:
+            self.assertFalse(spawn_proxy.call_count)
+        agent._router_removed(router_id)
+        if enableflag:
+            destroy_proxy.assert_called_with(mock.ANY, mock.ANY)
+        else:
+            self.assertFalse(destroy_proxy.call_count)
 
     def test_enable_metadata_proxy(self):
         self._configure_metadata_proxy()
@@ -1310,9 +1259,10 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         self.assertEqual([], agent.metadata_nat_rules())
 
+        # The metadata rules read the config when they are built, so the
+        # same agent picks up the new settings.
         self.conf.set_override('metadata_port', '8775')
         self.conf.set_override('enable_metadata_proxy', True)
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         rules = ('PREROUTING', '-s 0.0.0.0/0 -d 169.254.169.254/32 '
                  '-p tcp -m tcp --dport 80 -j REDIRECT --to-port 8775')
         self.assertEqual([rules], agent.metadata_nat_rules())
@@ -1451,9 +1401,10 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         self.assertEqual([], agent.metadata_filter_rules())
 
+        # The metadata rules read the config when they are built, so the
+        # same agent picks up the new settings.
         self.conf.set_override('metadata_port', '8775')
         self.conf.set_override('enable_metadata_proxy', True)
-        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         rules = ('INPUT', '-s 0.0.0.0/0 -d 127.0.0.1 '
                  '-p tcp -m tcp --dport 8775 -j ACCEPT')
         self.assertEqual([rules], agent.metadata_filter_rules())
@@ -1477,7 +1428,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
         pm = self.external_process.return_value
         pm.reset_mock()
 
-        agent._destroy_router_namespace = mock.MagicMock()
+        agent._destroy_router_namespace = mock.Mock()
         agent._cleanup_namespaces(router_list)
 
         self.assertEqual(pm.disable.call_count, len(stale_namespace_list))
@@ -1526,17 +1477,10 @@ class TestBasicRouterOperations(base.BaseTestCase):
     def test_create_dvr_gateway(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data()
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
+        ri = self._router_info(router)
 
-        port_id = _uuid()
-        dvr_gw_port = {'fixed_ips': [{'ip_address': '20.0.0.30',
-                                     'subnet_id': _uuid()}],
-                       'subnet': {'gateway_ip': '20.0.0.1'},
-                       'id': port_id,
-                       'network_id': _uuid(),
-                       'mac_address': 'ca:fe:de:ad:be:ef',
-                       'ip_cidr': '20.0.0.30/24'}
+        dvr_gw_port = copy.deepcopy(_AGENT_GW_PORT)
+        port_id = dvr_gw_port['id']
 
         snat_ports = [{'subnet': {'cidr': '152.2.0.0/16',
                                   'gateway_ip': '152.2.0.1',
@@ -1573,15 +1517,9 @@ class TestBasicRouterOperations(base.BaseTestCase):
 
     def test_agent_gateway_added(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
-        network_id = _uuid()
-        port_id = _uuid()
-        agent_gw_port = {'fixed_ips': [{'ip_address': '20.0.0.30',
-                                        'subnet_id': _uuid()}],
-                         'subnet': {'gateway_ip': '20.0.0.1'},
-                         'id': port_id,
-                         'network_id': network_id,
-                         'mac_address': 'ca:fe:de:ad:be:ef',
-                         'ip_cidr': '20.0.0.30/24'}
+        agent_gw_port = copy.deepcopy(_AGENT_GW_PORT)
+        network_id = agent_gw_port['network_id']
+        port_id = agent_gw_port['id']
         fip_ns_name = (
             agent.get_fip_ns_name(str(network_id)))
         interface_name = (
@@ -1602,15 +1540,9 @@ class TestBasicRouterOperations(base.BaseTestCase):
     def test_create_rtr_2_fip_link(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data()
-        fip = {'id': _uuid(),
-               'host': HOSTNAME,
-               'floating_ip_address': '15.1.2.3',
-               'fixed_ip_address': '192.168.0.1',
-               'floating_network_id': _uuid(),
-               'port_id': _uuid()}
-
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
+        fip = _floating_ip(host=HOSTNAME, floating_network_id=_uuid())
+
+        ri = self._router_info(router)
 
         rtr_2_fip_name = agent.get_rtr_int_device_name(ri.router_id)
         fip_2_rtr_name = agent.get_fip_int_device_name(ri.router_id)
@@ -1628,23 +1560,10 @@ class TestBasicRouterOperations(base.BaseTestCase):
     def test_floating_ip_added_dist(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data()
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
-        agent_gw_port = {'fixed_ips': [{'ip_address': '20.0.0.30',
-                                        'subnet_id': _uuid()}],
-                         'subnet': {'gateway_ip': '20.0.0.1'},
-                         'id': _uuid(),
-                         'network_id': _uuid(),
-                         'mac_address': 'ca:fe:de:ad:be:ef',
-                         'ip_cidr': '20.0.0.30/24'}
-
-        fip = {'id': _uuid(),
-               'host': HOSTNAME,
-               'floating_ip_address': '15.1.2.3',
-               'fixed_ip_address': '192.168.0.1',
-               'floating_network_id': _uuid(),
-               'port_id': _uuid()}
-        agent.agent_gateway_port = agent_gw_port
+        ri = self._router_info(router)
+
+        fip = _floating_ip(host=HOSTNAME, floating_network_id=_uuid())
+        agent.agent_gateway_port = copy.deepcopy(_AGENT_GW_PORT)
         agent.floating_ip_added_dist(ri, fip)
         self.mock_rule.add_rule_from.assert_called_with('192.168.0.1',
                                                         16, FIP_PRI)
@@ -1653,21 +1572,13 @@ class TestBasicRouterOperations(base.BaseTestCase):
     def test_floating_ip_removed_dist(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = self._prepare_router_data()
-        agent_gw_port = {'fixed_ips': [{'ip_address': '20.0.0.30',
-                                        'subnet_id': _uuid()}],
-                         'subnet': {'gateway_ip': '20.0.0.1'},
-                         'id': _uuid(),
-                         'network_id': _uuid(),
-                         'mac_address': 'ca:fe:de:ad:be:ef',
-                         'ip_cidr': '20.0.0.30/24'}
 
         fip_cidr = '11.22.33.44/24'
 
-        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
-                                 self.conf.use_namespaces, router=router)
+        ri = self._router_info(router)
         ri.dist_fip_count = 2
         ri.floating_ips_dict['11.22.33.44'] = FIP_PRI
-        agent.agent_gateway_port = agent_gw_port
+        agent.agent_gateway_port = copy.deepcopy(_AGENT_GW_PORT)
         agent.floating_ip_removed_dist(ri, fip_cidr)
         self.mock_rule.delete_rule_priority.assert_called_with(FIP_PRI)
         self.mock_ip_dev.route.delete_route.assert_called_with(fip_cidr,
@@ -1714,7 +1625,8 @@ class TestL3AgentEventHandler(base.BaseTestCase):
         )
         self.external_process_p.start()
         looping_call_p = mock.patch(
-            'neutron.openstack.common.loopingcall.FixedIntervalLoopingCall')
+            'neutron.openstack.common.loopingcall.FixedIntervalLoopingCall',
+            new=FakeLoopingCall)
         looping_call_p.start()
         self.agent = l3_agent.L3NATAgent(HOSTNAME)
 